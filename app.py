@@ -1,154 +1,47 @@
+# Отсчёт времени запуска начинается до импорта PyQt5 и остальных модулей
+from startup_trace import trace
 import sys
+from functools import partial
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
                             QTableWidget, QTableWidgetItem, QPushButton, 
                             QMessageBox, QInputDialog, QLineEdit, QLabel, 
                             QComboBox, QFormLayout, QDialog, QHBoxLayout, QHeaderView,
-                            QTabWidget)
-from PyQt5.QtCore import Qt
+                            QTabWidget, QTableView, QAbstractItemView, QProgressBar,
+                            QFileDialog, QProgressDialog, QCheckBox)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QDoubleValidator, QIntValidator, QIcon, QFont, QPixmap
-import psycopg2
-
-class DatabaseManager:
-    def __init__(self):
-        self.connection_params = {
-            "dbname": "mydb",
-            "user": "postgres",
-            "password": "123",
-            "host": "localhost",
-            "client_encoding": "utf8"
-        }
-        self.connection = None
-        self.cursor = None
-        self.connect()
-
-    def connect(self):
-        if self.connection is None:
-            try:
-                self.connection = psycopg2.connect(**self.connection_params)
-                self.cursor = self.connection.cursor()
-                # Устанавливаем кодировку для текущей сессии
-                self.cursor.execute("SET client_encoding TO 'UTF8';")
-                self.connection.commit()
-            except Exception as e:
-                print(f"Error connecting to database: {e}")
-                raise
-
-    def close(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
-            self.connection = None
-            self.cursor = None
-
-    def get_materials(self):
-        try:
-            self.connect()
-            self.cursor.execute("""
-                SELECT m.material_name, mt.material_type, m.unit_price, 
-                       m.stock_qty, m.min_qty, m.pack_qty, m.unit
-                FROM materials m
-                JOIN material_type mt ON m.material_type = mt.material_type
-            """)
-            return self.cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting materials: {e}")
-            raise
-
-    def add_material(self, name, type_id, price, quantity, min_quantity, package_quantity, unit):
-        self.cursor.execute(
-            "INSERT INTO materials (material_name, material_type, unit_price, stock_qty, min_qty, pack_qty, unit) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            (name, type_id, price, quantity, min_quantity, package_quantity, unit)
-        )
-        self.connection.commit()
-
-    def update_material(self, material_name, type_id, price, quantity, min_quantity, package_quantity, unit):
-        self.cursor.execute(
-            "UPDATE materials SET material_type = %s, unit_price = %s, stock_qty = %s, min_qty = %s, pack_qty = %s, unit = %s WHERE material_name = %s",
-            (type_id, price, quantity, min_quantity, package_quantity, unit, material_name)
-        )
-        self.connection.commit()
-
-    def delete_material(self, material_name):
-        self.cursor.execute("DELETE FROM materials WHERE material_name = %s", (material_name,))
-        self.connection.commit()
-
-    def get_material_types(self):
-        self.cursor.execute("SELECT material_type, defect_percent FROM material_type")
-        return self.cursor.fetchall()
-
-    def get_products(self):
-        self.cursor.execute("""
-            SELECT p.product_name, pt.product_type, p.sku, p.min_price, p.roll_width
-            FROM products p
-            JOIN product_type pt ON p.product_type = pt.product_type
-        """)
-        return self.cursor.fetchall()
-
-    def add_product(self, name, product_type, sku, min_price, roll_width):
-        self.cursor.execute(
-            "INSERT INTO products (product_name, product_type, sku, min_price, roll_width) VALUES (%s, %s, %s, %s, %s)",
-            (name, product_type, sku, min_price, roll_width)
-        )
-        self.connection.commit()
-
-    def update_product(self, old_name, name, product_type, sku, min_price, roll_width):
-        self.cursor.execute(
-            "UPDATE products SET product_name = %s, product_type = %s, sku = %s, min_price = %s, roll_width = %s WHERE product_name = %s",
-            (name, product_type, sku, min_price, roll_width, old_name)
-        )
-        self.connection.commit()
-
-    def delete_product(self, product_name):
-        self.cursor.execute("DELETE FROM products WHERE product_name = %s", (product_name,))
-        self.connection.commit()
-
-    def get_product_types(self):
-        self.cursor.execute("SELECT product_type, coef FROM product_type")
-        return self.cursor.fetchall()
-
-    def get_materials_by_product(self, product_name):
-        self.cursor.execute("""
-            SELECT m.material_name, pm.qty_needed 
-            FROM product_materials pm 
-            JOIN materials m ON pm.material_name = m.material_name 
-            WHERE pm.product_name = %s
-        """, (product_name,))
-        return self.cursor.fetchall()
-
-    def calculate_material_quantity(self, product_type_id, material_type_id, product_qty, param1, param2, stock_qty):
-        try:
-            # Get product type coefficient
-            self.cursor.execute("SELECT coef FROM product_type WHERE product_type = %s", (product_type_id,))
-            product_coef = self.cursor.fetchone()
-            if not product_coef:
-                return -1
-
-            # Get material defect percent
-            self.cursor.execute("SELECT defect_percent FROM material_type WHERE material_type = %s", (material_type_id,))
-            defect_percent = self.cursor.fetchone()
-            if not defect_percent:
-                return -1
-
-            # Calculate base quantity needed
-            base_qty = param1 * param2 * product_coef[0]
-            
-            # Calculate total quantity needed with defect percentage
-            total_qty = base_qty * product_qty * (1 + defect_percent[0]/100)
-            
-            # Calculate final quantity needed considering stock
-            final_qty = max(0, total_qty - stock_qty)
-            
-            return int(final_qty)
-        except:
-            return -1
+from table_models import LazyTableModel
+from db_worker import get_executor
+from database import DatabaseManager, ConflictError
+from db_metrics import enable_from_environment
+
+trace.mark("импорт модулей")
+
+def ask_conflict_resolution(parent):
+    # Возвращает "overwrite", "reload" или None (отмена)
+    message = QMessageBox(parent)
+    message.setIcon(QMessageBox.Warning)
+    message.setWindowTitle("Конфликт изменений")
+    message.setText("Запись была изменена другим пользователем после открытия окна.")
+    message.setInformativeText("Перезаписать её введёнными значениями или загрузить текущие данные?")
+    overwrite_button = message.addButton("Перезаписать", QMessageBox.AcceptRole)
+    reload_button = message.addButton("Загрузить изменения", QMessageBox.ActionRole)
+    message.addButton("Отмена", QMessageBox.RejectRole)
+    message.exec_()
+    if message.clickedButton() is overwrite_button:
+        return "overwrite"
+    if message.clickedButton() is reload_button:
+        return "reload"
+    return None
 
 class MaterialDialog(QDialog):
     def __init__(self, material=None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Добавить материал" if not material else "Редактировать материал")
         self.material = material
+        self.saved_row = None
         self.db = DatabaseManager()
+        self.executor = get_executor()
         self.init_ui()
         self.setMinimumWidth(500)
         self.setStyleSheet("""
@@ -200,9 +93,7 @@ class MaterialDialog(QDialog):
 
         # Material type
         self.type_combo = QComboBox()
-        types = self.db.get_material_types()
-        for type_name, defect_percent in types:
-            self.type_combo.addItem(type_name, type_name)
+        self.executor.submit(self.db.get_material_types, on_result=self.set_types, on_error=self.load_failed)
         layout.addRow("Тип материала:", self.type_combo)
 
         # Unit price
@@ -231,13 +122,7 @@ class MaterialDialog(QDialog):
 
         # Fill fields if editing
         if self.material:
-            self.name_input.setText(self.material[0])
-            self.type_combo.setCurrentIndex(self.type_combo.findData(self.material[1]))
-            self.price_input.setText(str(self.material[2]))
-            self.quantity_input.setText(str(self.material[3]))
-            self.min_quantity_input.setText(str(self.material[4]))
-            self.package_input.setText(str(self.material[5]))
-            self.unit_input.setText(self.material[6])
+            self.fill_fields()
 
         # Save button
         self.save_button = QPushButton("Сохранить")
@@ -246,6 +131,24 @@ class MaterialDialog(QDialog):
 
         self.setLayout(layout)
 
+    def fill_fields(self):
+        self.name_input.setText(self.material[0])
+        self.type_combo.setCurrentIndex(self.type_combo.findData(self.material[1]))
+        self.price_input.setText(str(self.material[2]))
+        self.quantity_input.setText(str(self.material[3]))
+        self.min_quantity_input.setText(str(self.material[4]))
+        self.package_input.setText(str(self.material[5]))
+        self.unit_input.setText(self.material[6])
+
+    def set_types(self, types):
+        for type_name, defect_percent in types:
+            self.type_combo.addItem(type_name, type_name)
+        if self.material:
+            self.type_combo.setCurrentIndex(self.type_combo.findData(self.material[1]))
+
+    def load_failed(self, error):
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить типы материалов: {str(error)}")
+
     def save_material(self):
         try:
             name = self.name_input.text()
@@ -261,29 +164,55 @@ class MaterialDialog(QDialog):
 
             if price < 0 or quantity < 0 or min_quantity < 0 or package_quantity < 0:
                 raise ValueError("Значения не могут быть отрицательными")
-
-            if self.material:
-                self.db.update_material(
-                    self.material[0], type_id, price, 
-                    quantity, min_quantity, package_quantity, unit
-                )
-            else:
-                self.db.add_material(
-                    name, type_id, price, quantity, 
-                    min_quantity, package_quantity, unit
-                )
-            self.accept()
         except ValueError as e:
             QMessageBox.warning(self, "Ошибка", str(e))
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить материал: {str(e)}")
+            return
+
+        self.save_button.setEnabled(False)
+        if self.material:
+            self.executor.submit(
+                self.db.update_material,
+                self.material[0], type_id, price, 
+                quantity, min_quantity, package_quantity, unit, self.material[7],
+                on_result=self.saved, on_error=self.save_failed
+            )
+        else:
+            self.executor.submit(
+                self.db.add_material,
+                name, type_id, price, quantity, 
+                min_quantity, package_quantity, unit,
+                on_result=self.saved, on_error=self.save_failed
+            )
+
+    def saved(self, row):
+        self.saved_row = row
+        self.accept()
+
+    def save_failed(self, error):
+        self.save_button.setEnabled(True)
+        if isinstance(error, ConflictError):
+            self.resolve_conflict(error.current)
+            return
+        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить материал: {str(error)}")
+
+    def resolve_conflict(self, current):
+        choice = ask_conflict_resolution(self)
+        if choice is None:
+            return
+        self.material = current
+        if choice == "overwrite":
+            self.save_material()
+        else:
+            self.fill_fields()
 
 class ProductDialog(QDialog):
     def __init__(self, product=None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Добавить продукт" if not product else "Редактировать продукт")
         self.product = product
+        self.saved_row = None
         self.db = DatabaseManager()
+        self.executor = get_executor()
         self.init_ui()
         self.setMinimumWidth(500)
         self.setStyleSheet("""
@@ -335,9 +264,7 @@ class ProductDialog(QDialog):
 
         # Product type
         self.type_combo = QComboBox()
-        types = self.db.get_product_types()
-        for type_name, coef in types:
-            self.type_combo.addItem(type_name, type_name)
+        self.executor.submit(self.db.get_product_types, on_result=self.set_types, on_error=self.load_failed)
         layout.addRow("Тип продукта:", self.type_combo)
 
         # SKU
@@ -356,11 +283,7 @@ class ProductDialog(QDialog):
 
         # Fill fields if editing
         if self.product:
-            self.name_input.setText(self.product[0])
-            self.type_combo.setCurrentIndex(self.type_combo.findData(self.product[1]))
-            self.sku_input.setText(self.product[2])
-            self.price_input.setText(str(self.product[3]))
-            self.width_input.setText(str(self.product[4]))
+            self.fill_fields()
 
         # Save button
         self.save_button = QPushButton("Сохранить")
@@ -369,6 +292,22 @@ class ProductDialog(QDialog):
 
         self.setLayout(layout)
 
+    def fill_fields(self):
+        self.name_input.setText(self.product[0])
+        self.type_combo.setCurrentIndex(self.type_combo.findData(self.product[1]))
+        self.sku_input.setText(self.product[2])
+        self.price_input.setText(str(self.product[3]))
+        self.width_input.setText(str(self.product[4]))
+
+    def set_types(self, types):
+        for type_name, coef in types:
+            self.type_combo.addItem(type_name, type_name)
+        if self.product:
+            self.type_combo.setCurrentIndex(self.type_combo.findData(self.product[1]))
+
+    def load_failed(self, error):
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить типы продукции: {str(error)}")
+
     def save_product(self):
         try:
             name = self.name_input.text()
@@ -382,48 +321,74 @@ class ProductDialog(QDialog):
 
             if min_price < 0 or roll_width < 0:
                 raise ValueError("Цена и ширина рулона не могут быть отрицательными")
-
-            if self.product:
-                self.db.update_product(
-                    self.product[0], name, product_type, sku, min_price, roll_width
-                )
-            else:
-                self.db.add_product(
-                    name, product_type, sku, min_price, roll_width
-                )
-            self.accept()
         except ValueError as e:
             QMessageBox.warning(self, "Ошибка", str(e))
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить продукт: {str(e)}")
+            return
+
+        self.save_button.setEnabled(False)
+        if self.product:
+            self.executor.submit(
+                self.db.update_product,
+                self.product[0], name, product_type, sku, min_price, roll_width, self.product[5],
+                on_result=self.saved, on_error=self.save_failed
+            )
+        else:
+            self.executor.submit(
+                self.db.add_product,
+                name, product_type, sku, min_price, roll_width,
+                on_result=self.saved, on_error=self.save_failed
+            )
+
+    def saved(self, row):
+        self.saved_row = row
+        self.accept()
+
+    def save_failed(self, error):
+        self.save_button.setEnabled(True)
+        if isinstance(error, ConflictError):
+            self.resolve_conflict(error.current)
+            return
+        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить продукт: {str(error)}")
+
+    def resolve_conflict(self, current):
+        choice = ask_conflict_resolution(self)
+        if choice is None:
+            return
+        self.product = current
+        if choice == "overwrite":
+            self.save_product()
+        else:
+            self.fill_fields()
 
 class MainWindow(QMainWindow):
+    # Представление дефицита обновлено (этим или другим приложением); испускается из
+    # потока DatabaseManager.watch_shortages, обработчик выполняется в потоке интерфейса
+    shortages_refreshed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Система управления производством")
         self.setWindowIcon(QIcon('icon.png'))
-        self.db = DatabaseManager()
-        self.init_ui()
-        self.setMinimumSize(1000, 700)
+        # Стили задаются один раз до создания виджетов, чтобы они не перестраивались повторно
         self.setStyleSheet("""
             QMainWindow {
                 background-color: #FFFFFF;
                 font-family: Gabriola, serif;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #FFFFFF;
                 gridline-color: #BBD9B2;
                 border: 1px solid #BBD9B2;
                 border-radius: 8px;
                 font-family: Gabriola, serif;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 8px;
                 font-size: 12px;
                 color: #333333;
                 font-family: Gabriola, serif;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #2D6033;
                 color: white;
             }
@@ -503,6 +468,21 @@ class MainWindow(QMainWindow):
                 color: #2D6033;
             }
         """)
+        trace.mark("стили")
+        self.db = None
+        self.executor = get_executor()
+        self.init_ui()
+        self.setMinimumSize(1000, 700)
+        trace.mark("построение окна")
+
+        # Подключение к базе выполняется в фоне, окно показывается сразу;
+        # вкладки строятся и загружают данные при первом открытии
+        self.connect_database()
+
+    def connect_database(self):
+        self.retry_connection_btn.setVisible(False)
+        self.statusBar().showMessage("Подключение к базе данных...")
+        self.executor.submit(DatabaseManager, on_result=self.database_ready, on_error=self.connection_failed)
 
     def init_ui(self):
         self.central_widget = QWidget()
@@ -539,29 +519,131 @@ class MainWindow(QMainWindow):
         
         # Materials tab
         self.materials_tab = QWidget()
-        self.init_materials_tab()
         self.tabs.addTab(self.materials_tab, "📦 Материалы")
         
         # Products tab
         self.products_tab = QWidget()
-        self.init_products_tab()
         self.tabs.addTab(self.products_tab, "🛋️ Продукция")
+
+        # Shortages tab
+        self.shortages_tab = QWidget()
+        self.tabs.addTab(self.shortages_tab, "⚠️ Дефицит")
+
+        # Содержимое вкладок создаётся в activate_tab при первом открытии
+        self.tab_builders = [self.init_materials_tab, self.init_products_tab, self.init_shortages_tab]
+        self.built_tabs = set()
+        self.shortages_model = None
+        self.tabs.currentChanged.connect(self.activate_tab)
         
         layout.addWidget(self.tabs)
         self.central_widget.setLayout(layout)
 
+        # Индикатор выполнения фоновых запросов
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(150)
+        self.busy_indicator.setVisible(False)
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+
+        # Повторное подключение, если первая попытка не удалась
+        self.retry_connection_btn = QPushButton("🔄 Подключиться")
+        self.retry_connection_btn.setVisible(False)
+        self.retry_connection_btn.clicked.connect(self.connect_database)
+        self.statusBar().addPermanentWidget(self.retry_connection_btn)
+        self.executor.busy_changed.connect(self.busy_indicator.setVisible)
+
+    def database_ready(self, db):
+        trace.mark("подключение к базе")
+        self.statusBar().clearMessage()
+        self.db = db
+        self.shortages_refreshed.connect(self.load_shortages)
+        self.db.watch_shortages(self.shortages_refreshed.emit)
+        self.activate_tab(self.tabs.currentIndex())
+        trace.mark("построение вкладки")
+        if self.executor.is_busy():
+            self.executor.busy_changed.connect(self.first_data_loaded)
+        else:
+            trace.finish("первые данные")
+
+    def first_data_loaded(self, busy):
+        if not busy:
+            self.executor.busy_changed.disconnect(self.first_data_loaded)
+            trace.finish("первые данные")
+
+    def connection_failed(self, error):
+        self.statusBar().showMessage("Нет подключения к базе данных")
+        self.retry_connection_btn.setVisible(True)
+        answer = QMessageBox.warning(
+            self, "Ошибка", f"Не удалось подключиться к базе данных: {str(error)}",
+            QMessageBox.Retry | QMessageBox.Close, QMessageBox.Retry
+        )
+        if answer == QMessageBox.Retry:
+            self.connect_database()
+
+    def activate_tab(self, index):
+        if self.db is None or index < 0 or index in self.built_tabs:
+            return
+        self.built_tabs.add(index)
+        self.tab_builders[index]()
+
     def init_materials_tab(self):
         layout = QVBoxLayout()
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
 
-        self.materials_table = QTableWidget()
-        self.materials_table.setColumnCount(6)
-        self.materials_table.setHorizontalHeaderLabels(["Наименование", "Тип", "Цена", "Количество", "Мин. количество", "Ед. измерения"])
+        self.materials_model = LazyTableModel(
+            ["Наименование", "Тип", "Цена", "Количество", "Мин. количество", "В упаковке", "Ед. измерения"],
+            self.db.get_materials_page,
+            executor=self.executor
+        )
+        self.materials_model.load_failed.connect(self.show_load_error)
+
+        # Фильтры применяются на сервере, с задержкой после последнего изменения
+        filter_layout = QHBoxLayout()
+        filter_layout.setSpacing(10)
+        self.material_search_input = QLineEdit()
+        self.material_search_input.setPlaceholderText("🔍 Поиск по наименованию")
+        filter_layout.addWidget(self.material_search_input, 2)
+        self.material_type_filter = QComboBox()
+        self.material_type_filter.addItem("Все типы", None)
+        filter_layout.addWidget(self.material_type_filter, 1)
+        self.material_price_from = QLineEdit()
+        self.material_price_from.setPlaceholderText("Цена от")
+        self.material_price_from.setValidator(QDoubleValidator(0, 99999999.99, 2))
+        filter_layout.addWidget(self.material_price_from)
+        self.material_price_to = QLineEdit()
+        self.material_price_to.setPlaceholderText("Цена до")
+        self.material_price_to.setValidator(QDoubleValidator(0, 99999999.99, 2))
+        filter_layout.addWidget(self.material_price_to)
+        self.material_below_min_check = QCheckBox("Ниже минимального остатка")
+        filter_layout.addWidget(self.material_below_min_check)
+        layout.addLayout(filter_layout)
+
+        self.material_filter_timer = QTimer(self)
+        self.material_filter_timer.setSingleShot(True)
+        self.material_filter_timer.setInterval(300)
+        self.material_filter_timer.timeout.connect(self.apply_material_filters)
+        self.material_search_input.textChanged.connect(self.material_filter_timer.start)
+        self.material_price_from.textChanged.connect(self.material_filter_timer.start)
+        self.material_price_to.textChanged.connect(self.material_filter_timer.start)
+        self.material_type_filter.currentIndexChanged.connect(self.material_filter_timer.start)
+        self.material_below_min_check.stateChanged.connect(self.material_filter_timer.start)
+        self.executor.submit(
+            self.db.get_material_types,
+            on_result=lambda types: self.fill_type_filter(self.material_type_filter, types)
+        )
+
+        self.materials_table = QTableView()
+        self.materials_table.setModel(self.materials_model)
+        self.materials_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.materials_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.materials_table.verticalHeader().setVisible(False)
         self.materials_table.setAlternatingRowColors(True)
         header = self.materials_table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
+        # Сортировка по клику на заголовок выполняется на сервере (LazyTableModel.sort)
+        header.setSortIndicator(0, Qt.AscendingOrder)
+        self.materials_table.setSortingEnabled(True)
         layout.addWidget(self.materials_table)
 
         button_layout = QHBoxLayout()
@@ -579,9 +661,25 @@ class MainWindow(QMainWindow):
         self.delete_material_btn.clicked.connect(self.delete_material)
         button_layout.addWidget(self.delete_material_btn)
 
-        self.show_materials_btn = QPushButton("🔍 Показать материалы")
-        self.show_materials_btn.clicked.connect(self.show_materials)
-        button_layout.addWidget(self.show_materials_btn)
+        self.material_price_btn = QPushButton("💲 Изменить цену")
+        self.material_price_btn.clicked.connect(self.change_material_prices)
+        button_layout.addWidget(self.material_price_btn)
+
+        self.material_type_btn = QPushButton("🏷️ Сменить тип")
+        self.material_type_btn.clicked.connect(self.change_material_type)
+        button_layout.addWidget(self.material_type_btn)
+
+        self.show_products_btn = QPushButton("🔍 Где используется")
+        self.show_products_btn.clicked.connect(self.show_materials)
+        button_layout.addWidget(self.show_products_btn)
+
+        self.import_materials_btn = QPushButton("📥 Импорт")
+        self.import_materials_btn.clicked.connect(self.import_materials)
+        button_layout.addWidget(self.import_materials_btn)
+
+        self.export_materials_btn = QPushButton("📤 Экспорт")
+        self.export_materials_btn.clicked.connect(lambda: self.export_table("materials", self.export_materials_btn))
+        button_layout.addWidget(self.export_materials_btn)
 
         layout.addLayout(button_layout)
         self.materials_tab.setLayout(layout)
@@ -592,13 +690,55 @@ class MainWindow(QMainWindow):
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
 
-        self.products_table = QTableWidget()
-        self.products_table.setColumnCount(5)
-        self.products_table.setHorizontalHeaderLabels(["Наименование", "Тип", "Артикул", "Мин. цена", "Ширина рулона"])
+        self.products_model = LazyTableModel(
+            ["Наименование", "Тип", "Артикул", "Мин. цена", "Ширина рулона"],
+            self.db.get_products_page,
+            executor=self.executor
+        )
+        self.products_model.load_failed.connect(self.show_load_error)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.setSpacing(10)
+        self.product_search_input = QLineEdit()
+        self.product_search_input.setPlaceholderText("🔍 Поиск по наименованию или артикулу")
+        filter_layout.addWidget(self.product_search_input, 2)
+        self.product_type_filter = QComboBox()
+        self.product_type_filter.addItem("Все типы", None)
+        filter_layout.addWidget(self.product_type_filter, 1)
+        self.product_price_from = QLineEdit()
+        self.product_price_from.setPlaceholderText("Цена от")
+        self.product_price_from.setValidator(QDoubleValidator(0, 99999999.99, 2))
+        filter_layout.addWidget(self.product_price_from)
+        self.product_price_to = QLineEdit()
+        self.product_price_to.setPlaceholderText("Цена до")
+        self.product_price_to.setValidator(QDoubleValidator(0, 99999999.99, 2))
+        filter_layout.addWidget(self.product_price_to)
+        layout.addLayout(filter_layout)
+
+        self.product_filter_timer = QTimer(self)
+        self.product_filter_timer.setSingleShot(True)
+        self.product_filter_timer.setInterval(300)
+        self.product_filter_timer.timeout.connect(self.apply_product_filters)
+        self.product_search_input.textChanged.connect(self.product_filter_timer.start)
+        self.product_price_from.textChanged.connect(self.product_filter_timer.start)
+        self.product_price_to.textChanged.connect(self.product_filter_timer.start)
+        self.product_type_filter.currentIndexChanged.connect(self.product_filter_timer.start)
+        self.executor.submit(
+            self.db.get_product_types,
+            on_result=lambda types: self.fill_type_filter(self.product_type_filter, types)
+        )
+
+        self.products_table = QTableView()
+        self.products_table.setModel(self.products_model)
+        self.products_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.products_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.products_table.verticalHeader().setVisible(False)
         self.products_table.setAlternatingRowColors(True)
         header = self.products_table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
+        # Сортировка по клику на заголовок выполняется на сервере (LazyTableModel.sort)
+        header.setSortIndicator(0, Qt.AscendingOrder)
+        self.products_table.setSortingEnabled(True)
         layout.addWidget(self.products_table)
 
         button_layout = QHBoxLayout()
@@ -616,87 +756,343 @@ class MainWindow(QMainWindow):
         self.delete_product_btn.clicked.connect(self.delete_product)
         button_layout.addWidget(self.delete_product_btn)
 
+        self.product_price_btn = QPushButton("💲 Изменить цену")
+        self.product_price_btn.clicked.connect(self.change_product_prices)
+        button_layout.addWidget(self.product_price_btn)
+
+        self.product_type_btn = QPushButton("🏷️ Сменить тип")
+        self.product_type_btn.clicked.connect(self.change_product_type)
+        button_layout.addWidget(self.product_type_btn)
+
         self.show_materials_btn = QPushButton("🔍 Показать материалы")
         self.show_materials_btn.clicked.connect(self.show_product_materials)
         button_layout.addWidget(self.show_materials_btn)
 
+        self.product_costs_btn = QPushButton("🧮 Себестоимость")
+        self.product_costs_btn.clicked.connect(self.show_product_costs)
+        button_layout.addWidget(self.product_costs_btn)
+
+        self.import_products_btn = QPushButton("📥 Импорт")
+        self.import_products_btn.clicked.connect(self.import_products)
+        button_layout.addWidget(self.import_products_btn)
+
+        self.export_products_btn = QPushButton("📤 Экспорт")
+        self.export_products_btn.clicked.connect(lambda: self.export_table("products", self.export_products_btn))
+        button_layout.addWidget(self.export_products_btn)
+
+        self.export_bom_btn = QPushButton("📤 Экспорт состава")
+        self.export_bom_btn.clicked.connect(lambda: self.export_table("product_materials", self.export_bom_btn))
+        button_layout.addWidget(self.export_bom_btn)
+
         layout.addLayout(button_layout)
         self.products_tab.setLayout(layout)
         self.load_products()
 
+    def init_shortages_tab(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        self.shortages_model = LazyTableModel(
+            ["Наименование", "Тип", "Количество", "Мин. количество", "Дефицит",
+             "Упаковок к заказу", "Стоимость", "Ед. измерения"],
+            self.db.get_shortages_page,
+            executor=self.executor
+        )
+        self.shortages_model.load_failed.connect(self.show_load_error)
+        self.shortages_table = QTableView()
+        self.shortages_table.setModel(self.shortages_model)
+        self.shortages_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.shortages_table.verticalHeader().setVisible(False)
+        self.shortages_table.setAlternatingRowColors(True)
+        header = self.shortages_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        header.setSortIndicator(0, Qt.AscendingOrder)
+        self.shortages_table.setSortingEnabled(True)
+        layout.addWidget(self.shortages_table)
+
+        button_layout = QHBoxLayout()
+        button_layout.setSpacing(10)
+
+        self.shortages_total_label = QLabel()
+        button_layout.addWidget(self.shortages_total_label, 1)
+
+        self.refresh_shortages_btn = QPushButton("🔄 Обновить")
+        self.refresh_shortages_btn.clicked.connect(self.refresh_shortages)
+        button_layout.addWidget(self.refresh_shortages_btn)
+
+        layout.addLayout(button_layout)
+        self.shortages_tab.setLayout(layout)
+        self.load_shortages()
+
+    def load_shortages(self):
+        if self.shortages_model is None:
+            # Вкладка ещё не открывалась и загрузит данные при открытии
+            return
+        self.shortages_model.reload()
+        self.executor.submit(
+            self.db.get_shortages_total,
+            on_result=self.show_shortages_total, on_error=self.show_load_error, tag="shortages_total"
+        )
+
+    def show_shortages_total(self, total):
+        count, cost = total
+        self.shortages_total_label.setText(f"Материалов с дефицитом: {count}, стоимость закупки: {cost:.2f}")
+
+    def refresh_shortages(self):
+        self.executor.submit(
+            self.db.refresh_shortages,
+            on_result=lambda _: self.load_shortages(), on_error=self.show_load_error, tag="shortages_refresh"
+        )
+
+    def update_material_rows(self, rows):
+        self.materials_model.update_rows(rows)
+
+    def remove_material_rows(self, rows):
+        self.materials_model.remove_rows([row[0] for row in rows])
+
     def load_materials(self):
-        materials = self.db.get_materials()
-        self.materials_table.setRowCount(len(materials))
-        for row, material in enumerate(materials):
-            for col, value in enumerate(material):
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.materials_table.setItem(row, col, item)
+        self.materials_model.reload()
+
+    def fill_type_filter(self, combo, types):
+        for type_name, _ in types:
+            combo.addItem(type_name, type_name)
+
+    def price_filter_value(self, line_edit):
+        text = line_edit.text().strip().replace(",", ".")
+        try:
+            return float(text) if text else None
+        except ValueError:
+            return None
+
+    def apply_material_filters(self):
+        filters = {
+            "search": self.material_search_input.text(),
+            "type": self.material_type_filter.currentData(),
+            "min_price": self.price_filter_value(self.material_price_from),
+            "max_price": self.price_filter_value(self.material_price_to),
+            "below_min": self.material_below_min_check.isChecked(),
+        }
+        self.materials_model.fetch_page = partial(self.db.get_materials_page, filters=filters)
+        self.load_materials()
+
+    def apply_product_filters(self):
+        filters = {
+            "search": self.product_search_input.text(),
+            "type": self.product_type_filter.currentData(),
+            "min_price": self.price_filter_value(self.product_price_from),
+            "max_price": self.price_filter_value(self.product_price_to),
+        }
+        self.products_model.fetch_page = partial(self.db.get_products_page, filters=filters)
+        self.load_products()
+
+    def selected_material(self):
+        rows = self.materials_table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.materials_model.row_at(rows[0].row())
+
+    def selected_material_rows(self):
+        rows = self.materials_table.selectionModel().selectedRows()
+        return [self.materials_model.row_at(index.row()) for index in rows]
+
+    def selected_material_names(self):
+        return [row[0] for row in self.selected_material_rows()]
 
     def load_products(self):
-        products = self.db.get_products()
-        self.products_table.setRowCount(len(products))
-        for row, product in enumerate(products):
-            for col, value in enumerate(product):
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.products_table.setItem(row, col, item)
+        self.products_model.reload()
+
+    def selected_product(self):
+        rows = self.products_table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.products_model.row_at(rows[0].row())
+
+    def selected_product_rows(self):
+        rows = self.products_table.selectionModel().selectedRows()
+        return [self.products_model.row_at(index.row()) for index in rows]
+
+    def selected_product_names(self):
+        return [row[0] for row in self.selected_product_rows()]
+
+    def show_load_error(self, error):
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить данные: {str(error)}")
 
     def add_material(self):
         dialog = MaterialDialog()
         if dialog.exec_() == QDialog.Accepted:
-            self.load_materials()
+            self.materials_model.insert_row(dialog.saved_row)
 
     def edit_material(self):
-        selected = self.materials_table.selectedItems()
+        selected = self.selected_material()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для редактирования!")
             return
 
-        material_name = self.materials_table.item(selected[0].row(), 0).text()
-        materials = self.db.get_materials()
-        material = next((m for m in materials if m[0] == material_name), None)
-
+        material_name = selected[0]
+        material = self.materials_model.row_by_key(material_name)
+        if material:
+            self.open_material_dialog(material)
+        else:
+            self.executor.submit(
+                self.db.get_material, material_name,
+                on_result=self.open_material_dialog,
+                on_error=self.show_load_error
+            )
+
+    def open_material_dialog(self, material):
         if material:
             dialog = MaterialDialog(material)
             if dialog.exec_() == QDialog.Accepted:
-                self.load_materials()
+                if dialog.saved_row:
+                    self.materials_model.update_row(dialog.saved_row)
+                else:
+                    # Материал был удалён другим пользователем
+                    self.materials_model.remove_row(material[0])
+            elif dialog.material is not material:
+                # При конфликте в окно были загружены изменения другого пользователя
+                self.materials_model.update_row(dialog.material)
 
     def delete_material(self):
-        selected = self.materials_table.selectedItems()
-        if not selected:
+        materials = self.selected_material_rows()
+        material_names = [row[0] for row in materials]
+        if not material_names:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для удаления!")
             return
 
-        material_name = self.materials_table.item(selected[0].row(), 0).text()
-        reply = QMessageBox.question(self, "Подтверждение", "Вы уверены, что хотите удалить этот материал?", QMessageBox.Yes | QMessageBox.No)
+        if len(material_names) == 1:
+            question = "Вы уверены, что хотите удалить этот материал?"
+        else:
+            question = f"Вы уверены, что хотите удалить выбранные материалы ({len(material_names)})?"
+        reply = QMessageBox.question(self, "Подтверждение", question, QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.db.delete_material(material_name)
+            # Удаляются только строки, не изменённые с момента загрузки
+            self.run_bulk(
+                self.db.delete_materials, material_names,
+                lambda rows: self.materials_deleted(material_names, rows),
+                [row[7] for row in materials],
+                show_error=self.show_delete_error
+            )
+
+    def materials_deleted(self, material_names, rows):
+        self.remove_material_rows(rows)
+        if len(rows) < len(material_names):
+            self.show_skipped_rows(len(material_names) - len(rows), "удалено")
             self.load_materials()
 
+    def show_skipped_rows(self, count, action):
+        QMessageBox.warning(
+            self, "Конфликт изменений",
+            f"Не {action} записей: {count}. Они были изменены или удалены другим пользователем, "
+            "таблица обновлена."
+        )
+
+    def change_material_prices(self):
+        material_names = self.selected_material_names()
+        if not material_names:
+            QMessageBox.warning(self, "Ошибка", "Выберите материалы!")
+            return
+        percent, ok = QInputDialog.getDouble(self, "Изменение цены", "Изменение цены, %:", 0, -99.99, 1000, 2)
+        if ok:
+            self.run_bulk(self.db.change_material_prices, material_names, self.update_material_rows, percent)
+
+    def change_material_type(self):
+        materials = self.selected_material_rows()
+        material_names = [row[0] for row in materials]
+        if not material_names:
+            QMessageBox.warning(self, "Ошибка", "Выберите материалы!")
+            return
+        # Справочник типов может потребовать запроса к базе (кэш устарел), поэтому
+        # загружается в фоне, а выбор типа открывается по готовности
+        self.executor.submit(
+            self.db.get_material_types,
+            on_result=lambda types: self.choose_material_type(materials, types),
+            on_error=self.show_load_error
+        )
+
+    def choose_material_type(self, materials, material_types):
+        material_names = [row[0] for row in materials]
+        types = [type_name for type_name, defect_percent in material_types]
+        type_id, ok = QInputDialog.getItem(self, "Смена типа", "Тип материала:", types, 0, False)
+        if ok:
+            # Тип меняется только у строк, не изменённых с момента загрузки
+            self.run_bulk(
+                self.db.set_material_type, material_names,
+                lambda rows: self.materials_retyped(material_names, rows),
+                type_id, [row[7] for row in materials]
+            )
+
+    def materials_retyped(self, material_names, rows):
+        self.update_material_rows(rows)
+        if len(rows) < len(material_names):
+            self.show_skipped_rows(len(material_names) - len(rows), "изменено")
+            self.load_materials()
+
+    def run_bulk(self, bulk_function, keys, apply_rows, *args, show_error=None):
+        # Групповая операция в фоне; для больших выделений показывается прогресс
+        progress_dialog = QProgressDialog("Выполнение операции...", None, 0, 100, self)
+        progress_dialog.setWindowTitle("Подождите")
+        progress_dialog.setMinimumDuration(500)
+        progress_dialog.setValue(0)
+
+        def finished(rows):
+            progress_dialog.close()
+            apply_rows(rows)
+
+        def failed(error):
+            progress_dialog.close()
+            if show_error is not None:
+                show_error(error)
+            else:
+                QMessageBox.warning(self, "Ошибка", f"Операция не выполнена: {str(error)}")
+
+        self.executor.submit(
+            bulk_function, keys, *args,
+            on_result=finished, on_error=failed, on_progress=progress_dialog.setValue
+        )
+
+    def show_delete_error(self, error):
+        QMessageBox.warning(self, "Ошибка", f"Не удалось удалить запись: {str(error)}")
+
     def show_materials(self):
-        selected = self.materials_table.selectedItems()
-        if not selected:
+        material_names = self.selected_material_names()
+        if not material_names:
             QMessageBox.warning(self, "Ошибка", "Выберите материал!")
             return
 
-        material_name = self.materials_table.item(selected[0].row(), 0).text()
-        products = self.db.get_materials_by_product(material_name)
+        self.show_products_btn.setEnabled(False)
+        self.executor.submit(
+            self.db.get_products_by_materials, material_names,
+            on_result=lambda usages: self.show_material_usages(material_names, usages),
+            on_error=self.show_usages_error
+        )
+
+    def show_usages_error(self, error):
+        self.show_products_btn.setEnabled(True)
+        self.show_load_error(error)
 
+    def show_material_usages(self, material_names, usages):
+        self.show_products_btn.setEnabled(True)
         dialog = QDialog(self)
-        dialog.setWindowTitle(f"Продукция, использующая {material_name}")
+        if len(material_names) == 1:
+            dialog.setWindowTitle(f"Продукция, использующая {material_names[0]}")
+        else:
+            dialog.setWindowTitle(f"Продукция, использующая выбранные материалы ({len(material_names)})")
         dialog.setMinimumWidth(500)
         
         layout = QVBoxLayout()
         table = QTableWidget()
-        table.setColumnCount(2)
-        table.setHorizontalHeaderLabels(["Продукция", "Количество"])
-        table.setRowCount(len(products))
+        table.setColumnCount(3)
+        table.setHorizontalHeaderLabels(["Материал", "Продукция", "Количество"])
+        table.setRowCount(len(usages))
         
-        for row, (product, quantity) in enumerate(products):
-            table.setItem(row, 0, QTableWidgetItem(product))
-            table.setItem(row, 1, QTableWidgetItem(str(quantity)))
+        for row, (material, product, quantity) in enumerate(usages):
+            table.setItem(row, 0, QTableWidgetItem(material))
+            table.setItem(row, 1, QTableWidgetItem(product))
+            table.setItem(row, 2, QTableWidgetItem(str(quantity)))
         
+        # Для одного материала колонка с его наименованием не нужна
+        table.setColumnHidden(0, len(material_names) == 1)
         table.resizeColumnsToContents()
         layout.addWidget(table)
         dialog.setLayout(layout)
@@ -705,68 +1101,229 @@ class MainWindow(QMainWindow):
     def add_product(self):
         dialog = ProductDialog()
         if dialog.exec_() == QDialog.Accepted:
-            self.load_products()
+            self.products_model.insert_row(dialog.saved_row)
 
     def edit_product(self):
-        selected = self.products_table.selectedItems()
+        selected = self.selected_product()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите продукт для редактирования!")
             return
 
-        product_name = self.products_table.item(selected[0].row(), 0).text()
-        products = self.db.get_products()
-        product = next((p for p in products if p[0] == product_name), None)
-
+        product_name = selected[0]
+        product = self.products_model.row_by_key(product_name)
+        if product:
+            self.open_product_dialog(product)
+        else:
+            self.executor.submit(
+                self.db.get_product, product_name,
+                on_result=self.open_product_dialog,
+                on_error=self.show_load_error
+            )
+
+    def open_product_dialog(self, product):
         if product:
             dialog = ProductDialog(product)
             if dialog.exec_() == QDialog.Accepted:
-                self.load_products()
+                if dialog.saved_row:
+                    self.products_model.update_row(dialog.saved_row, old_key=product[0])
+                else:
+                    self.products_model.remove_row(product[0])
+            elif dialog.product is not product:
+                self.products_model.update_row(dialog.product)
 
     def delete_product(self):
-        selected = self.products_table.selectedItems()
-        if not selected:
+        products = self.selected_product_rows()
+        product_names = [row[0] for row in products]
+        if not product_names:
             QMessageBox.warning(self, "Ошибка", "Выберите продукт для удаления!")
             return
 
-        product_name = self.products_table.item(selected[0].row(), 0).text()
-        reply = QMessageBox.question(self, "Подтверждение", "Вы уверены, что хотите удалить этот продукт?", QMessageBox.Yes | QMessageBox.No)
+        if len(product_names) == 1:
+            question = "Вы уверены, что хотите удалить этот продукт?"
+        else:
+            question = f"Вы уверены, что хотите удалить выбранные продукты ({len(product_names)})?"
+        reply = QMessageBox.question(self, "Подтверждение", question, QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.db.delete_product(product_name)
+            self.run_bulk(
+                self.db.delete_products, product_names,
+                lambda rows: self.products_deleted(product_names, rows),
+                [row[5] for row in products],
+                show_error=self.show_delete_error
+            )
+
+    def products_deleted(self, product_names, rows):
+        self.products_model.remove_rows([row[0] for row in rows])
+        if len(rows) < len(product_names):
+            self.show_skipped_rows(len(product_names) - len(rows), "удалено")
+            self.load_products()
+
+    def change_product_prices(self):
+        product_names = self.selected_product_names()
+        if not product_names:
+            QMessageBox.warning(self, "Ошибка", "Выберите продукты!")
+            return
+        percent, ok = QInputDialog.getDouble(self, "Изменение цены", "Изменение минимальной цены, %:", 0, -99.99, 1000, 2)
+        if ok:
+            self.run_bulk(self.db.change_product_prices, product_names, self.products_model.update_rows, percent)
+
+    def change_product_type(self):
+        products = self.selected_product_rows()
+        product_names = [row[0] for row in products]
+        if not product_names:
+            QMessageBox.warning(self, "Ошибка", "Выберите продукты!")
+            return
+        self.executor.submit(
+            self.db.get_product_types,
+            on_result=lambda types: self.choose_product_type(products, types),
+            on_error=self.show_load_error
+        )
+
+    def choose_product_type(self, products, product_types):
+        product_names = [row[0] for row in products]
+        types = [type_name for type_name, coef in product_types]
+        product_type, ok = QInputDialog.getItem(self, "Смена типа", "Тип продукта:", types, 0, False)
+        if ok:
+            # Тип меняется только у строк, не изменённых с момента загрузки
+            self.run_bulk(
+                self.db.set_product_type, product_names,
+                lambda rows: self.products_retyped(product_names, rows),
+                product_type, [row[5] for row in products]
+            )
+
+    def products_retyped(self, product_names, rows):
+        self.products_model.update_rows(rows)
+        if len(rows) < len(product_names):
+            self.show_skipped_rows(len(product_names) - len(rows), "изменено")
             self.load_products()
 
     def show_product_materials(self):
-        selected = self.products_table.selectedItems()
+        selected = self.selected_product()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите продукт!")
             return
 
-        product_name = self.products_table.item(selected[0].row(), 0).text()
-        materials = self.db.get_materials_by_product(product_name)
+        product_name = selected[0]
 
         dialog = QDialog(self)
         dialog.setWindowTitle(f"Материалы для {product_name}")
         dialog.setMinimumWidth(500)
         
         layout = QVBoxLayout()
-        table = QTableWidget()
-        table.setColumnCount(2)
-        table.setHorizontalHeaderLabels(["Материал", "Количество"])
-        table.setRowCount(len(materials))
-        
-        for row, (material, quantity) in enumerate(materials):
-            table.setItem(row, 0, QTableWidgetItem(material))
-            table.setItem(row, 1, QTableWidgetItem(str(quantity)))
-        
-        table.resizeColumnsToContents()
+        model = LazyTableModel(
+            ["Материал", "Количество"],
+            lambda after_name, limit: self.db.get_materials_by_product_page(product_name, after_name, limit),
+            executor=self.executor,
+            parent=dialog
+        )
+        model.load_failed.connect(self.show_load_error)
+        model.fetchMore()
+        table = QTableView()
+        table.setModel(model)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(table)
         dialog.setLayout(layout)
         dialog.exec_()
 
+    def show_product_costs(self):
+        # Сначала досчитываются себестоимости, сброшенные после изменения цен или состава
+        self.product_costs_btn.setEnabled(False)
+        self.executor.submit(
+            self.db.update_product_costs,
+            on_result=lambda _: self.open_product_costs(), on_error=self.show_costs_error
+        )
+
+    def show_costs_error(self, error):
+        self.product_costs_btn.setEnabled(True)
+        self.show_load_error(error)
+
+    def open_product_costs(self):
+        self.product_costs_btn.setEnabled(True)
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Себестоимость материалов")
+        dialog.setMinimumSize(700, 500)
+
+        layout = QVBoxLayout()
+        model = LazyTableModel(
+            ["Продукция", "Тип", "Себестоимость", "Мин. цена", "Разница"],
+            self.db.get_product_costs_page,
+            executor=self.executor,
+            parent=dialog
+        )
+        model.load_failed.connect(self.show_load_error)
+        table = QTableView()
+        table.setModel(model)
+        table.verticalHeader().setVisible(False)
+        header = table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        header.setSortIndicator(0, Qt.AscendingOrder)
+        table.setSortingEnabled(True)
+        model.fetchMore()
+        layout.addWidget(table)
+        dialog.setLayout(layout)
+        dialog.exec_()
+
+    def import_materials(self):
+        self.import_file(self.db.import_materials, self.import_materials_btn, self.load_materials)
+
+    def import_products(self):
+        self.import_file(self.db.import_products, self.import_products_btn, self.load_products)
+
+    def import_file(self, import_function, button, reload):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт", "", "CSV (*.csv);;Excel (*.xlsx);;Все файлы (*)"
+        )
+        if not path:
+            return
+        button.setEnabled(False)
+
+        def finished(result):
+            button.setEnabled(True)
+            reload()
+            imported, rejected = result
+            message = QMessageBox(self)
+            message.setWindowTitle("Импорт")
+            message.setText(f"Загружено строк: {imported}\nОтклонено строк: {len(rejected)}")
+            if rejected:
+                message.setDetailedText("\n".join(
+                    f"Строка {line}: {key or ''} — {error}" for line, key, error in rejected[:1000]
+                ))
+            message.exec_()
+
+        def failed(error):
+            button.setEnabled(True)
+            QMessageBox.warning(self, "Ошибка", f"Не удалось импортировать файл: {str(error)}")
+
+        self.executor.submit(import_function, path, on_result=finished, on_error=failed)
+
+    def export_table(self, table, button):
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Экспорт", f"{table}.csv", "CSV (*.csv);;Parquet (*.parquet)"
+        )
+        if not path:
+            return
+        if not path.lower().endswith((".csv", ".parquet")):
+            path += ".parquet" if "parquet" in selected_filter else ".csv"
+        button.setEnabled(False)
+
+        def finished(exported):
+            button.setEnabled(True)
+            QMessageBox.information(self, "Экспорт", f"Выгружено строк: {exported}")
+
+        def failed(error):
+            button.setEnabled(True)
+            QMessageBox.warning(self, "Ошибка", f"Не удалось выгрузить данные: {str(error)}")
+
+        self.executor.submit(self.db.export_table, table, path, on_result=finished, on_error=failed)
+
     def closeEvent(self, event):
-        self.db.close()
+        self.executor.wait()
+        if self.db is not None:
+            self.db.close()
         event.accept()
 
 if __name__ == "__main__":
+    enable_from_environment()
     app = QApplication(sys.argv)
     
     # Установка шрифта для всего приложения
@@ -774,7 +1331,9 @@ if __name__ == "__main__":
     font.setFamily("Segoe UI")
     font.setPointSize(10)
     app.setFont(font)
+    trace.mark("QApplication")
     
     window = MainWindow()
     window.show()
+    trace.mark("показ окна")
     sys.exit(app.exec_())
\ No newline at end of file
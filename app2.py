@@ -1,12 +1,13 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
-                            QTableWidget, QTableWidgetItem, QPushButton, 
+                            QTableWidget, QTableWidgetItem, QTableView, QPushButton, 
                             QMessageBox, QInputDialog, QLineEdit, QLabel, 
                             QComboBox, QFormLayout, QDialog, QTabWidget, QHBoxLayout, QHeaderView)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QDoubleValidator, QIntValidator, QIcon, QColor, QPalette, QPixmap
 from PyQt5.QtGui import QFont
-import psycopg2
+from repository import Repository
+from table_models import LazyTableModel
 
 class StyledMainWindow(QMainWindow):
     def __init__(self):
@@ -72,7 +73,7 @@ class StyledMainWindow(QMainWindow):
                 padding-top: 12px;
                 padding-bottom: 8px;
             }}
-            QTableWidget {{
+            QTableView {{
                 background-color: {self.primary_bg};
                 gridline-color: {self.secondary_bg};
                 border: 1px solid {self.secondary_bg};
@@ -80,13 +81,13 @@ class StyledMainWindow(QMainWindow):
                 padding: 5px;
                 font-family: Constantia, serif;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 border-bottom: 1px solid {self.secondary_bg};
                 color: {self.text_color};
                 font-family: Constantia, serif;
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {self.accent_color};
                 color: white;
             }}
@@ -129,81 +130,12 @@ class StyledMainWindow(QMainWindow):
             }}
         """)
 
-class DatabaseManager:
-    def __init__(self):
-        self.connection = psycopg2.connect(
-            dbname="furniture_db",
-            user="postgres",
-            password="123Qwe",
-            host="localhost"
-        )
-        self.cursor = self.connection.cursor()
-
-    # Методы для работы с материалами
-    def get_materials(self):
-        self.cursor.execute("""
-            SELECT m.material_id, m.material_name, mt.type_name, m.unit_price, 
-                   m.quantity_in_stock, m.min_quantity, m.unit_of_measure
-            FROM Materials m
-            JOIN MaterialTypes mt ON m.material_type_id = mt.material_type_id
-        """)
-        return self.cursor.fetchall()
-
-    def add_material(self, name, type_id, price, quantity, min_quantity, package_quantity, unit):
-        self.cursor.execute(
-            "INSERT INTO Materials (material_name, material_type_id, unit_price, quantity_in_stock, min_quantity, package_quantity, unit_of_measure) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            (name, type_id, price, quantity, min_quantity, package_quantity, unit)
-        )
-        self.connection.commit()
-
-    def update_material(self, material_id, name, type_id, price, quantity, min_quantity, package_quantity, unit):
-        self.cursor.execute(
-            "UPDATE Materials SET material_name=%s, material_type_id=%s, unit_price=%s, quantity_in_stock=%s, min_quantity=%s, package_quantity=%s, unit_of_measure=%s WHERE material_id=%s",
-            (name, type_id, price, quantity, min_quantity, package_quantity, unit, material_id)
-        )
-        self.connection.commit()
-
-    def delete_material(self, material_id):
-        self.cursor.execute("DELETE FROM Materials WHERE material_id = %s", (material_id,))
-        self.connection.commit()
-
-    # Методы для работы с продукцией
-    def get_products(self):
-        self.cursor.execute("""
-            SELECT p.product_id, p.product_name, pt.type_name, p.min_partner_price
-            FROM Products p
-            JOIN ProductTypes pt ON p.product_type_id = pt.product_type_id
-        """)
-        return self.cursor.fetchall()
-
-    # Методы для работы с партнерами
-    def get_partners(self):
-        self.cursor.execute("SELECT partner_id, company_name, phone, email FROM Partners")
-        return self.cursor.fetchall()
-
-    def get_material_types(self):
-        self.cursor.execute("SELECT material_type_id, type_name FROM MaterialTypes")
-        return self.cursor.fetchall()
-
-    def get_product_types(self):
-        self.cursor.execute("SELECT product_type_id, type_name FROM ProductTypes")
-        return self.cursor.fetchall()
-
-    def get_products_by_material(self, material_id):
-        self.cursor.execute("""
-            SELECT p.product_name, mp.required_quantity 
-            FROM MaterialProducts mp 
-            JOIN Products p ON mp.product_id = p.product_id 
-            WHERE mp.material_id = %s
-        """, (material_id,))
-        return self.cursor.fetchall()
-
 class MaterialDialog(QDialog):
     def __init__(self, material=None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Добавить материал" if not material else "Редактировать материал")
         self.material = material
-        self.db = DatabaseManager()
+        self.db = Repository("furniture")
         self.init_ui()
         self.setMinimumWidth(500)
         self.setStyleSheet(f"""
@@ -326,7 +258,7 @@ class MainWindow(StyledMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Система управления производством")
-        self.db = DatabaseManager()
+        self.db = Repository("furniture")
         self.init_ui()
         self.resize(1000, 700)
 
@@ -394,17 +326,18 @@ class MainWindow(StyledMainWindow):
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
         
-        # Таблица материалов
-        self.materials_table = QTableWidget()
-        self.materials_table.setColumnCount(7)
-        self.materials_table.setHorizontalHeaderLabels(
-            ["ID", "Наименование", "Тип", "Цена", "Количество", "Мин. количество", "Ед. измерения"]
+        # Таблица материалов, строки подгружаются страницами при прокрутке
+        self.materials_model = LazyTableModel(
+            ["ID", "Наименование", "Тип", "Цена", "Количество", "Мин. количество", "Ед. измерения"],
+            self.db.get_materials_page
         )
-        self.materials_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.materials_table = QTableView()
+        self.materials_table.setModel(self.materials_model)
+        self.materials_table.setSelectionBehavior(QTableView.SelectRows)
         self.materials_table.verticalHeader().setVisible(False)
         self.materials_table.setAlternatingRowColors(True)
         self.materials_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #F8F9FA;
             }
         """)
@@ -448,14 +381,11 @@ class MainWindow(StyledMainWindow):
         self.load_materials()
     
     def load_materials(self):
-        materials = self.db.get_materials()
-        self.materials_table.setRowCount(len(materials))
-        for row, material in enumerate(materials):
-            for col, value in enumerate(material):
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.materials_table.setItem(row, col, item)
-        self.materials_table.resizeColumnsToContents()
+        self.materials_model.reload()
+
+    def selected_material(self):
+        rows = self.materials_table.selectionModel().selectedRows()
+        return self.materials_model.row_at(rows[0].row()) if rows else None
     
     def add_material(self):
         dialog = MaterialDialog()
@@ -463,14 +393,13 @@ class MainWindow(StyledMainWindow):
             self.load_materials()
     
     def edit_material(self):
-        selected = self.materials_table.selectedItems()
+        selected = self.selected_material()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для редактирования")
             return
         
-        material_id = int(self.materials_table.item(selected[0].row(), 0).text())
-        materials = self.db.get_materials()
-        material = next((m for m in materials if m[0] == material_id), None)
+        material_id = selected[0]
+        material = self.db.get_material(material_id)
         
         if material:
             dialog = MaterialDialog(material)
@@ -478,12 +407,12 @@ class MainWindow(StyledMainWindow):
                 self.load_materials()
     
     def delete_material(self):
-        selected = self.materials_table.selectedItems()
+        selected = self.selected_material()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для удаления")
             return
         
-        material_id = int(self.materials_table.item(selected[0].row(), 0).text())
+        material_id = selected[0]
         reply = QMessageBox.question(
             self, "Подтверждение", 
             "Вы уверены, что хотите удалить этот материал?",
@@ -495,13 +424,12 @@ class MainWindow(StyledMainWindow):
             self.load_materials()
     
     def show_material_products(self):
-        selected = self.materials_table.selectedItems()
+        selected = self.selected_material()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите материал")
             return
         
-        material_id = int(self.materials_table.item(selected[0].row(), 0).text())
-        material_name = self.materials_table.item(selected[0].row(), 1).text()
+        material_id, material_name = selected[0], selected[1]
         products = self.db.get_products_by_material(material_id)
         
         dialog = QDialog(self)
@@ -1,54 +1,11 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
-                            QTableWidget, QTableWidgetItem, QPushButton, 
+                            QTableWidget, QTableWidgetItem, QTableView, QPushButton, 
                             QMessageBox, QInputDialog, QLineEdit, QLabel, 
                             QComboBox, QFormLayout, QDialog, QHBoxLayout)
-from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QDoubleValidator, QIntValidator, QIcon, QFont
-import psycopg2
-
-class DatabaseManager:
-    def __init__(self):
-        self.connection = psycopg2.connect(
-            dbname="furniture_db",
-            user="postgres",
-            password="123Qwe",
-            host="localhost"
-        )
-        self.cursor = self.connection.cursor()
-
-    def get_materials(self):
-        self.cursor.execute("SELECT * FROM Materials")
-        return self.cursor.fetchall()
-
-    def add_material(self, name, type_id, price, quantity, min_quantity, package_quantity, unit):
-        self.cursor.execute(
-            "INSERT INTO Materials (material_name, material_type_id, unit_price, quantity_in_stock, min_quantity, package_quantity, unit_of_measure) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            (name, type_id, price, quantity, min_quantity, package_quantity, unit)
-        )
-        self.connection.commit()
-
-    def update_material(self, material_id, name, type_id, price, quantity, min_quantity, package_quantity, unit):
-        self.cursor.execute(
-            "UPDATE Materials SET material_name = %s, material_type_id = %s, unit_price = %s, quantity_in_stock = %s, min_quantity = %s, package_quantity = %s, unit_of_measure = %s WHERE material_id = %s",
-            (name, type_id, price, quantity, min_quantity, package_quantity, unit, material_id)
-        )
-        self.connection.commit()
-
-    def delete_material(self, material_id):
-        self.cursor.execute("DELETE FROM Materials WHERE material_id = %s", (material_id,))
-        self.connection.commit()
-
-    def get_material_types(self):
-        self.cursor.execute("SELECT * FROM MaterialTypes")
-        return self.cursor.fetchall()
-
-    def get_products_by_material(self, material_id):
-        self.cursor.execute(
-            "SELECT p.product_name, mp.required_quantity FROM MaterialProducts mp JOIN Products p ON mp.product_id = p.product_id WHERE mp.material_id = %s",
-            (material_id,)
-        )
-        return self.cursor.fetchall()
+from repository import Repository
+from table_models import LazyTableModel
 
 class MaterialDialog(QDialog):
     def __init__(self, material=None, parent=None):
@@ -56,7 +13,7 @@ class MaterialDialog(QDialog):
         self.setWindowTitle("Добавить/Редактировать материал" if not material else "Редактировать материал")
         self.setWindowIcon(QIcon('icon.png'))
         self.material = material
-        self.db = DatabaseManager()
+        self.db = Repository("furniture")
         self.init_ui()
 
     def init_ui(self):
@@ -92,7 +49,7 @@ class MaterialDialog(QDialog):
 
         self.type_combo = QComboBox()
         types = self.db.get_material_types()
-        for type_id, type_name, _ in types:
+        for type_id, type_name in types:
             self.type_combo.addItem(type_name, type_id)
         layout.addRow("Тип материала:", self.type_combo)
 
@@ -155,13 +112,13 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle("Управление материалами")
         self.setWindowIcon(QIcon('Образ плюс.ico'))
-        self.db = DatabaseManager()
+        self.db = Repository("furniture")
         self.init_ui()
         self.setStyleSheet("""
             QMainWindow {
                 background-color: #FFFFFF;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #FFFFFF;
                 gridline-color: #BFD6F6;
                 border: 1px solid #BFD6F6;
@@ -195,9 +152,14 @@ class MainWindow(QMainWindow):
         layout.setContentsMargins(10, 10, 10, 10)
         layout.setSpacing(10)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels(["ID", "Наименование", "Тип", "Цена", "Количество", "Мин. количество", "Ед. измерения"])
+        # Строки подгружаются страницами при прокрутке
+        self.model = LazyTableModel(
+            ["ID", "Наименование", "Тип", "Цена", "Количество", "Мин. количество", "Ед. измерения"],
+            self.db.get_materials_page
+        )
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.verticalHeader().setVisible(False)
         layout.addWidget(self.table)
 
@@ -224,29 +186,25 @@ class MainWindow(QMainWindow):
         self.load_materials()
 
     def load_materials(self):
-        materials = self.db.get_materials()
-        self.table.setRowCount(len(materials))
-        for row, material in enumerate(materials):
-            for col, value in enumerate(material):
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                self.table.setItem(row, col, item)
+        self.model.reload()
         self.table.resizeColumnsToContents()
 
+    def selected_material_id(self):
+        rows = self.table.selectionModel().selectedRows()
+        return self.model.row_at(rows[0].row())[0] if rows else None
+
     def add_material(self):
         dialog = MaterialDialog()
         if dialog.exec_():
             self.load_materials()
 
     def edit_material(self):
-        selected = self.table.selectedItems()
-        if not selected:
+        material_id = self.selected_material_id()
+        if material_id is None:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для редактирования!")
             return
 
-        material_id = int(self.table.item(selected[0].row(), 0).text())
-        materials = self.db.get_materials()
-        material = next((m for m in materials if m[0] == material_id), None)
+        material = self.db.get_material(material_id)
 
         if material:
             dialog = MaterialDialog(material)
@@ -254,24 +212,22 @@ class MainWindow(QMainWindow):
                 self.load_materials()
 
     def delete_material(self):
-        selected = self.table.selectedItems()
-        if not selected:
+        material_id = self.selected_material_id()
+        if material_id is None:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для удаления!")
             return
 
-        material_id = int(self.table.item(selected[0].row(), 0).text())
         reply = QMessageBox.question(self, "Подтверждение", "Вы уверены, что хотите удалить этот материал?", QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
             self.db.delete_material(material_id)
             self.load_materials()
 
     def show_products(self):
-        selected = self.table.selectedItems()
-        if not selected:
+        material_id = self.selected_material_id()
+        if material_id is None:
             QMessageBox.warning(self, "Ошибка", "Выберите материал для просмотра продукции!")
             return
 
-        material_id = int(self.table.item(selected[0].row(), 0).text())
         products = self.db.get_products_by_material(material_id)
 
         dialog = QDialog(self)
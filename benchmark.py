@@ -0,0 +1,381 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+
+import db_pool
+from database import DatabaseManager
+from repository import SCHEMAS
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mydb.txt")
+
+# Синтетический каталог: типы, материалы, продукция, состав и вложенные спецификации.
+# setseed делает случайные значения одинаковыми от запуска к запуску
+DATA_QUERIES = [
+    "SELECT setseed(0.42)",
+    """
+        INSERT INTO material_type
+        SELECT 'Тип материала ' || i, round((random() * 2)::numeric, 2)
+        FROM generate_series(1, 8) AS i
+    """,
+    """
+        INSERT INTO product_type
+        SELECT 'Тип продукции ' || i, round((0.5 + random() * 8)::numeric, 2)
+        FROM generate_series(1, 4) AS i
+    """,
+    """
+        INSERT INTO materials
+        SELECT 'Материал ' || lpad(i::text, 7, '0'),
+               'Тип материала ' || (1 + i %% 8),
+               round((10 + random() * 5000)::numeric, 2),
+               round((random() * 3000)::numeric, 2),
+               round((random() * 1500)::numeric, 2),
+               (ARRAY[5, 10, 25, 50, 100, 220])[1 + i %% 6],
+               (ARRAY['кг', 'л', 'рул'])[1 + i %% 3]
+        FROM generate_series(1, %(materials)s) AS i
+    """,
+    """
+        INSERT INTO products
+        SELECT 'Тип продукции ' || (1 + i %% 4),
+               'Продукция ' || lpad(i::text, 7, '0'),
+               (1000000 + i)::text,
+               round((1000 + random() * 20000)::numeric, 2),
+               round((0.3 + random())::numeric, 2)
+        FROM generate_series(1, %(products)s) AS i
+    """,
+    """
+        INSERT INTO product_materials
+        SELECT 'Продукция ' || lpad(p::text, 7, '0'),
+               'Материал ' || lpad((1 + (p * 7919 + k * (%(materials)s / %(bom_lines)s)) %% %(materials)s)::text, 7, '0'),
+               round((0.01 + random() * 3)::numeric, 4)
+        FROM generate_series(1, %(products)s) AS p, generate_series(0, %(bom_lines)s - 1) AS k
+    """,
+    # Каждая десятая продукция содержит следующую как полуфабрикат (два уровня вложенности)
+    """
+        INSERT INTO product_components
+        SELECT 'Продукция ' || lpad(p::text, 7, '0'),
+               'Продукция ' || lpad((p + 1)::text, 7, '0'),
+               round((0.5 + random() * 2)::numeric, 4)
+        FROM generate_series(1, %(products)s - 1) AS p
+        WHERE p %% 10 = 1
+    """,
+    "REFRESH MATERIALIZED VIEW material_shortages",
+]
+
+
+def schema_sql(skip_trgm=False):
+    # Из mydb.txt берутся создание таблиц и представления, без тестовых данных
+    with open(SCHEMA_FILE, encoding="utf-8") as schema_file:
+        text = schema_file.read()
+    tables, rest = text.split("-- 2. Заполнение таблиц", 1)
+    views = rest.split("-- 3. Представления", 1)[1]
+    lines = []
+    for line in (tables + views).splitlines():
+        if line.startswith("\\"):
+            continue
+        if skip_trgm and ("pg_trgm" in line or "gin_trgm_ops" in line):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def create_database(dbname, materials, products, bom_lines):
+    params = dict(SCHEMAS["mydb"]["connection"], dbname="postgres")
+    params.pop("cursor_factory", None)
+    connection = psycopg2.connect(**params)
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{dbname}"')
+            cursor.execute(f'CREATE DATABASE "{dbname}"')
+    finally:
+        connection.close()
+
+    params["dbname"] = dbname
+    connection = psycopg2.connect(**params)
+    try:
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute(schema_sql())
+        except psycopg2.Error as e:
+            # Без расширения pg_trgm поиск по подстроке работает, но без индекса
+            if "pg_trgm" not in str(e):
+                raise
+            print("Расширение pg_trgm недоступно, схема создаётся без триграммных индексов")
+            with connection, connection.cursor() as cursor:
+                cursor.execute(schema_sql(skip_trgm=True))
+
+        sizes = {"materials": materials, "products": products, "bom_lines": bom_lines}
+        with connection, connection.cursor() as cursor:
+            for query in DATA_QUERIES:
+                cursor.execute(query, sizes)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE")
+    finally:
+        connection.close()
+
+
+def measure(repeat, function, setup=None):
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(min(times), 3),
+        "rows": len(result) if hasattr(result, "__len__") else None,
+    }
+
+
+def clear_bom_cache(db):
+    with db.pool.cursor() as cursor:
+        cursor.execute("DELETE FROM product_bom_cache")
+
+
+def run_database_benchmarks(db, repeat, materials, products, bom_lines):
+    results = {}
+    middle_material = f"Материал {materials // 2:07d}"
+    middle_product = f"Продукция {products // 2:07d}"
+    sample_products = [f"Продукция {i:07d}" for i in range(1, products + 1, max(1, products // 100))]
+    sample_materials = [f"Материал {i:07d}" for i in range(1, materials + 1, max(1, materials // 100))]
+    orders = [(name, 10) for name in sample_products]
+
+    cases = [
+        ("get_materials", lambda: db.get_materials(), None),
+        ("get_products", lambda: db.get_products(), None),
+        ("get_materials_page.first", lambda: db.get_materials_page(), None),
+        ("get_materials_page.middle", lambda: db.get_materials_page(middle_material), None),
+        ("get_materials_page.by_price", lambda: db.get_materials_page(order=(2, True)), None),
+        ("get_materials_page.search", lambda: db.get_materials_page(filters={"search": "12"}), None),
+        ("get_products_page.first", lambda: db.get_products_page(), None),
+        ("get_products_page.middle", lambda: db.get_products_page(middle_product), None),
+        ("get_materials_by_product", lambda: db.get_materials_by_product(middle_product), None),
+        ("get_products_by_materials", lambda: db.get_products_by_materials(sample_materials), None),
+        ("explode_bom.cold", lambda: db.explode_bom(sample_products), lambda: clear_bom_cache(db)),
+        ("explode_bom.warm", lambda: db.explode_bom(sample_products), None),
+        ("plan_purchases", lambda: db.plan_purchases(orders), None),
+    ]
+    for name, function, setup in cases:
+        results[name] = measure(repeat, function, setup)
+        print_result(name, results[name])
+
+    # Расчёт количества материала: поштучный вызов и пакетный вариант на одних данных
+    # (параметры в Decimal, как коэффициенты справочников)
+    product_types = list(db.reference.lookup("product_type"))
+    material_types = list(db.reference.lookup("material_type"))
+    count = 10000
+    arguments = [
+        (product_types[i % len(product_types)], material_types[i % len(material_types)],
+         1 + i % 50, Decimal("0.5") + i % 7, Decimal(1 + i % 3), Decimal(i % 100))
+        for i in range(count)
+    ]
+    results["calculate_material_quantity"] = measure(
+        repeat, lambda: [db.calculate_material_quantity(*values) for values in arguments]
+    )
+    print_result("calculate_material_quantity", results["calculate_material_quantity"])
+    columns = list(zip(*arguments))
+    results["calculate_material_quantities"] = measure(
+        repeat, lambda: db.calculate_material_quantities(*columns)
+    )
+    print_result("calculate_material_quantities", results["calculate_material_quantities"])
+    return results
+
+
+def run_prepared_benchmarks(db, repeat, materials, products, calls):
+    # Время одного вызова частых запросов без подготовки и с серверными подготовленными
+    # запросами (db_pool.execute_prepared); разница — разбор и планирование запроса,
+    # которые для подготовленного запроса не повторяются
+    middle_material = f"Материал {materials // 2:07d}"
+    middle_product = f"Продукция {products // 2:07d}"
+    cases = [
+        ("get_material", lambda: db.get_material(middle_material)),
+        ("get_product", lambda: db.get_product(middle_product)),
+        ("get_materials_by_product", lambda: db.get_materials_by_product(middle_product)),
+        ("get_products_by_material", lambda: db.get_products_by_material(middle_material)),
+        ("get_materials_page.middle", lambda: db.get_materials_page(middle_material)),
+        ("get_shortages_page.first", lambda: db.get_shortages_page()),
+    ]
+    results = {}
+    try:
+        for name, function in cases:
+            per_call = {}
+            for prepared in (False, True):
+                db_pool.PREPARE_STATEMENTS = prepared
+                function()
+                result = measure(repeat, lambda: [function() for _ in range(calls)])
+                per_call[prepared] = {
+                    "median_ms": round(result["median_ms"] / calls, 4),
+                    "min_ms": round(result["min_ms"] / calls, 4),
+                    "rows": None,
+                }
+            results[f"{name}.unprepared"] = per_call[False]
+            results[f"{name}.prepared"] = per_call[True]
+            saved = per_call[False]["median_ms"] - per_call[True]["median_ms"]
+            print(
+                f"{name:<34} без подготовки {per_call[False]['median_ms']:8.4f} мс  "
+                f"подготовленный {per_call[True]['median_ms']:8.4f} мс  "
+                f"экономия {saved:+8.4f} мс ({saved / per_call[False]['median_ms'] * 100:+.0f}%)"
+            )
+    finally:
+        db_pool.PREPARE_STATEMENTS = True
+    return results
+
+
+def run_window_benchmarks(repeat, rows_to_load):
+    # Окно строится без дисплея; время — до первой страницы открытой вкладки
+    # и до загрузки rows_to_load строк материалов прокруткой
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import app
+
+    application = QApplication.instance() or QApplication(sys.argv)
+    windows = []
+
+    def wait(window):
+        while window.executor.is_busy():
+            application.processEvents()
+            time.sleep(0.001)
+        application.processEvents()
+
+    def open_window():
+        window = app.MainWindow()
+        window.show()
+        wait(window)
+        windows.append(window)
+        return window
+
+    def scroll_materials():
+        window = windows[-1]
+        model = window.materials_model
+        while model.rowCount() < rows_to_load and model.canFetchMore():
+            model.fetchMore()
+            wait(window)
+        return range(model.rowCount())
+
+    results = {}
+    results["MainWindow.first_page"] = measure(repeat, open_window)
+    print_result("MainWindow.first_page", results["MainWindow.first_page"])
+    results["MainWindow.scroll_materials"] = measure(1, scroll_materials)
+    print_result("MainWindow.scroll_materials", results["MainWindow.scroll_materials"])
+    for window in windows:
+        window.hide()
+        window.deleteLater()
+    application.processEvents()
+    return results
+
+
+def print_result(name, result):
+    rows = "" if result["rows"] is None else f"  строк: {result['rows']}"
+    print(f"{name:<34} медиана {result['median_ms']:>10.2f} мс  минимум {result['min_ms']:>10.2f} мс{rows}")
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as history_file:
+        return json.load(history_file)
+
+
+def compare(previous, current, threshold, min_delta_ms):
+    # Регрессия — медиана выросла больше чем на threshold процентов и не меньше
+    # чем на min_delta_ms (разброс замеров в доли миллисекунды не учитывается)
+    regressions = []
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if not before or not before["median_ms"]:
+            continue
+        change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+        regression = change > threshold and result["median_ms"] - before["median_ms"] >= min_delta_ms
+        mark = "  РЕГРЕССИЯ" if regression else ""
+        print(f"{name:<34} {before['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} мс  {change:+7.1f}%{mark}")
+        if regression:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности на синтетических данных")
+    parser.add_argument("--scale", type=int, default=10000, help="число материалов (1000 - 1000000)")
+    parser.add_argument("--products", type=int, help="число продукции (по умолчанию scale / 10)")
+    parser.add_argument("--bom-lines", type=int, default=5, help="материалов в составе одной продукции")
+    parser.add_argument("--dbname", default="mydb_bench", help="база данных для замеров (пересоздаётся)")
+    parser.add_argument("--skip-setup", action="store_true", help="использовать уже заполненную базу")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=5000, help="строк материалов для прокрутки в окне")
+    parser.add_argument("--calls", type=int, default=500, help="вызовов в замере подготовленных запросов")
+    parser.add_argument("--no-gui", action="store_true", help="без замеров окна приложения")
+    parser.add_argument("--output", default="benchmark_results.json", help="файл истории замеров")
+    parser.add_argument("--threshold", type=float, default=20.0, help="допустимый рост медианы, %%")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="минимальный рост медианы для регрессии, мс")
+    args = parser.parse_args()
+
+    # База для замеров удаляется и создаётся заново, рабочие базы приложений трогать нельзя
+    working_databases = {schema["connection"]["dbname"] for schema in SCHEMAS.values()}
+    if not args.skip_setup and args.dbname in working_databases:
+        parser.error(f"база {args.dbname} используется приложением и не может быть пересоздана")
+
+    products = args.products or max(1, args.scale // 10)
+    if not args.skip_setup:
+        started = time.perf_counter()
+        create_database(args.dbname, args.scale, products, args.bom_lines)
+        print(f"База {args.dbname} заполнена за {time.perf_counter() - started:.1f} с")
+
+    SCHEMAS["mydb"]["connection"]["dbname"] = args.dbname
+    db = DatabaseManager()
+    try:
+        with db.pool.cursor() as cursor:
+            cursor.execute("SHOW server_version")
+            server_version = cursor.fetchone()[0]
+        results = run_database_benchmarks(db, args.repeat, args.scale, products, args.bom_lines)
+        results.update(run_prepared_benchmarks(db, args.repeat, args.scale, products, args.calls))
+        if not args.no_gui:
+            results.update(run_window_benchmarks(args.repeat, args.rows))
+    finally:
+        db.close()
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "scale": args.scale,
+        "products": products,
+        "bom_lines": args.bom_lines,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "postgres": server_version,
+        "host": platform.node(),
+        "results": results,
+    }
+    history = load_history(args.output)
+    previous = next(
+        (item for item in reversed(history)
+         if (item["scale"], item["products"], item["bom_lines"]) == (run["scale"], run["products"], run["bom_lines"])),
+        None
+    )
+    history.append(run)
+    with open(args.output, "w", encoding="utf-8") as history_file:
+        json.dump(history, history_file, ensure_ascii=False, indent=2)
+
+    if previous is None:
+        print(f"Результаты сохранены в {args.output}; предыдущих замеров того же масштаба нет")
+        return 0
+    print(f"\nСравнение с замером от {previous['timestamp']}:")
+    regressions = compare(previous, run, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"Регрессии (рост больше {args.threshold:g}%): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import csv
+import io
+import os
+
+NUMERIC_OID = 1700
+
+
+class FileFormatError(ValueError):
+    pass
+
+
+class RowStream(io.TextIOBase):
+    # Файлоподобный объект для COPY FROM STDIN: строки из итератора
+    # превращаются в CSV по мере чтения, весь файл в памяти не собирается
+    def __init__(self, rows, source=None):
+        # source — файл, из которого читаются строки; закрывается вместе с потоком
+        self._rows = iter(rows)
+        self._source = source
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            chunk = [row for _, row in zip(range(1000), self._rows)]
+            if not chunk:
+                break
+            self._writer.writerows(chunk)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+        super().close()
+
+
+def _map_header(header, aliases):
+    columns = []
+    for name in header:
+        name = (name or "").strip()
+        column = aliases.get(name.lower())
+        if column is None:
+            raise FileFormatError(f"Неизвестная колонка в файле: {name}")
+        columns.append(column)
+    missing = set(aliases.values()) - set(columns)
+    if missing:
+        raise FileFormatError(f"В файле нет колонок: {', '.join(sorted(missing))}")
+    return columns
+
+
+def _numbered_rows(rows, width):
+    # rows — [(номер строки файла, значения)]; строка для COPY: номер, ровно width значений
+    # и причина отказа (пустая — NULL), если число значений не совпадает с заголовком
+    for line_no, values in rows:
+        error = ""
+        if len(values) != width:
+            error = f"неверное число полей: {len(values)} вместо {width}"
+            values = (list(values) + [""] * width)[:width]
+        yield [line_no] + list(values) + [error]
+
+
+def _csv_rows(stream, delimiter):
+    # Номер строки записи — первая строка файла, с которой она начинается: значение
+    # в кавычках может занимать несколько строк
+    reader = csv.reader(stream, delimiter=delimiter)
+    while True:
+        line_no = reader.line_num + 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            raise FileFormatError(f"Строка {line_no}: {e}")
+        if any(value.strip() for value in row):
+            yield line_no, row
+
+
+def open_import_source(path, aliases):
+    # Возвращает (колонки staging-таблицы, поток CSV для COPY). Первая колонка — line_no,
+    # номер строки файла (для Excel — строки листа), последняя — error: строки с неверным
+    # числом полей не прерывают загрузку, а попадают в отчёт вместе с остальными ошибками.
+    # Пустые строки пропускаются.
+    # aliases: {название колонки в файле в нижнем регистре: колонка таблицы}
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise FileFormatError("Для импорта из Excel установите пакет openpyxl")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise FileFormatError("Файл пуст")
+        columns = _map_header(header, aliases)
+        width = len(columns)
+        # Ячейки правее заголовка не читаются, недостающие в конце строки — пустые
+        rows = ((line_no, ["" if value is None else value for value in row[:width]] + [""] * (width - len(row)))
+                for line_no, row in enumerate(rows, 2) if any(value is not None for value in row))
+        return ["line_no"] + columns + ["error"], RowStream(_numbered_rows(rows, width))
+
+    stream = open(path, encoding="utf-8-sig", newline="")
+    header_line = stream.readline()
+    if not header_line.strip():
+        stream.close()
+        raise FileFormatError("Файл пуст")
+    # Excel с русской локалью сохраняет CSV с разделителем «;»
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    try:
+        columns = _map_header(next(csv.reader([header_line], delimiter=delimiter)), aliases)
+    except FileFormatError:
+        stream.close()
+        raise
+    # Заголовок уже прочитан: нумерация записей продолжается со второй строки файла
+    rows = ((line_no + 1, row) for line_no, row in _csv_rows(stream, delimiter))
+    return ["line_no"] + columns + ["error"], RowStream(_numbered_rows(rows, len(columns)), stream)
+
+
+def parquet_writer(path, description):
+    # Схема Parquet строится по описанию колонок курсора: NUMERIC с заданной
+    # точностью становится decimal, NUMERIC без неё — double, остальное — строки
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise FileFormatError("Для выгрузки в Parquet установите пакет pyarrow")
+    fields = []
+    for column in description:
+        if column.type_code == NUMERIC_OID:
+            if column.precision and column.precision <= 38:
+                field_type = pa.decimal128(column.precision, column.scale or 0)
+            else:
+                field_type = pa.float64()
+        else:
+            field_type = pa.string()
+        fields.append(pa.field(column.name, field_type))
+    schema = pa.schema(fields)
+    writer = pq.ParquetWriter(path, schema)
+
+    def write(rows):
+        columns = list(zip(*rows))
+        arrays = []
+        for values, field in zip(columns, schema):
+            if pa.types.is_floating(field.type):
+                values = [None if value is None else float(value) for value in values]
+            elif pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    return write, writer.close
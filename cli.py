@@ -0,0 +1,200 @@
+import argparse
+import csv
+import sys
+from decimal import Decimal, InvalidOperation
+
+import psycopg2
+
+from database import DatabaseManager, EXPORT_TABLES
+from repository import SCHEMAS
+from db_metrics import enable_from_environment
+
+# Командная строка для пакетных заданий: работает с базой через DatabaseManager
+# и не загружает PyQt5, поэтому запускается на серверах без дисплея
+
+# Заголовки и функция постраничной загрузки для команды list;
+# у материалов и продукции последняя колонка страницы — версия строки, она не выводится
+LIST_TABLES = {
+    "materials": (
+        ["Наименование", "Тип", "Цена", "Количество", "Мин. количество", "В упаковке", "Ед. измерения"],
+        "get_materials_page", True
+    ),
+    "products": (
+        ["Наименование", "Тип", "Артикул", "Мин. цена", "Ширина рулона"],
+        "get_products_page", True
+    ),
+    "shortages": (
+        ["Наименование", "Тип", "Количество", "Мин. количество", "Дефицит", "Упаковок", "Стоимость", "Ед. измерения"],
+        "get_shortages_page", False
+    ),
+}
+
+
+def list_rows(db, args):
+    headers, method, filtered = LIST_TABLES[args.table]
+    fetch_page = getattr(db, method)
+    kwargs = {}
+    if filtered:
+        kwargs["filters"] = {"search": args.search, "type": args.type}
+    elif args.search or args.type:
+        print("Фильтры --search и --type для этой таблицы не поддерживаются", file=sys.stderr)
+        return 2
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    writer.writerow(headers)
+    after_key = None
+    printed = 0
+    while args.limit is None or printed < args.limit:
+        limit = 1000 if args.limit is None else min(1000, args.limit - printed)
+        rows = fetch_page(after_key, limit, **kwargs)
+        for row in rows:
+            writer.writerow(row[:len(headers)])
+        printed += len(rows)
+        if len(rows) < limit:
+            break
+        after_key = rows[-1][0]
+    return 0
+
+
+def import_rows(db, args):
+    import_function = db.import_materials if args.table == "materials" else db.import_products
+    imported, rejected = import_function(args.path)
+    print(f"Загружено строк: {imported}")
+    for line, key, error in rejected:
+        print(f"Строка {line}: {key or ''} — {error}", file=sys.stderr)
+    if rejected:
+        print(f"Отклонено строк: {len(rejected)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def export_rows(db, args):
+    exported = db.export_table(args.table, args.path)
+    print(f"Выгружено строк: {exported}")
+    return 0
+
+
+def calculate(db, args):
+    quantity = db.calculate_material_quantity(
+        args.product_type, args.material_type, args.product_qty, args.param1, args.param2, args.stock_qty
+    )
+    if quantity < 0:
+        print("Неизвестный тип продукции или материала, либо неверные параметры", file=sys.stderr)
+        return 1
+    print(quantity)
+    return 0
+
+
+def decimal_value(value):
+    # Коэффициенты справочников — Decimal, поэтому и параметры расчёта передаются в Decimal
+    try:
+        return Decimal(value.replace(",", "."))
+    except InvalidOperation:
+        raise argparse.ArgumentTypeError(f"ожидается число: {value}")
+
+
+def parse_order(value):
+    product_name, separator, quantity = value.rpartition("=")
+    if not separator or not product_name:
+        raise argparse.ArgumentTypeError(f"ожидается ПРОДУКЦИЯ=КОЛИЧЕСТВО: {value}")
+    try:
+        return product_name, float(quantity)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"количество должно быть числом: {value}")
+
+
+def read_orders(path):
+    # CSV с колонками продукция и количество, разделитель , или ;
+    with open(path, encoding="utf-8-sig", newline="") as orders_file:
+        sample = orders_file.read(4096)
+        orders_file.seek(0)
+        delimiter = ";" if sample.count(";") > sample.count(",") else ","
+        orders = []
+        for line, row in enumerate(csv.reader(orders_file, delimiter=delimiter), 1):
+            if not row or not row[0].strip():
+                continue
+            try:
+                orders.append((row[0].strip(), float(row[1])))
+            except (IndexError, ValueError):
+                if line == 1:
+                    continue  # заголовок
+                raise ValueError(f"Строка {line}: ожидается продукция и количество")
+        return orders
+
+
+def plan(db, args):
+    orders = list(args.orders)
+    if args.file:
+        orders.extend(read_orders(args.file))
+    if not orders:
+        print("Не задан план: ПРОДУКЦИЯ=КОЛИЧЕСТВО или --file", file=sys.stderr)
+        return 2
+    rows = db.plan_purchases(orders)
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    writer.writerow(["Материал", "Потребность", "Остаток", "Нехватка", "К закупке", "Ед. измерения"])
+    writer.writerows(rows)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Работа с базой «Образ Плюс» без запуска интерфейса")
+    parser.add_argument("--dbname", help="база данных (по умолчанию из описания схемы mydb в repository.py)")
+    parser.add_argument("--host", help="сервер PostgreSQL")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("list", help="вывести таблицу (TSV)")
+    command.add_argument("table", choices=sorted(LIST_TABLES))
+    command.add_argument("--search", help="подстрока наименования")
+    command.add_argument("--type", help="тип материала или продукции")
+    command.add_argument("--limit", type=int, help="не больше строк")
+    command.set_defaults(handler=list_rows)
+
+    command = commands.add_parser("import", help="загрузить CSV или Excel")
+    command.add_argument("table", choices=["materials", "products"])
+    command.add_argument("path")
+    command.set_defaults(handler=import_rows)
+
+    command = commands.add_parser("export", help="выгрузить таблицу в CSV или Parquet")
+    command.add_argument("table", choices=sorted(EXPORT_TABLES))
+    command.add_argument("path", help="файл .csv или .parquet")
+    command.set_defaults(handler=export_rows)
+
+    command = commands.add_parser("calculate", help="количество материала для выпуска продукции")
+    command.add_argument("product_type")
+    command.add_argument("material_type")
+    command.add_argument("product_qty", type=int)
+    command.add_argument("param1", type=decimal_value)
+    command.add_argument("param2", type=decimal_value)
+    command.add_argument("stock_qty", type=decimal_value, nargs="?", default=Decimal(0))
+    command.set_defaults(handler=calculate)
+
+    command = commands.add_parser("plan", help="потребность в материалах под план выпуска (TSV)")
+    command.add_argument("orders", nargs="*", type=parse_order, metavar="ПРОДУКЦИЯ=КОЛИЧЕСТВО")
+    command.add_argument("--file", help="CSV с колонками продукция и количество")
+    command.set_defaults(handler=plan)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    enable_from_environment()
+    if args.dbname:
+        SCHEMAS["mydb"]["connection"]["dbname"] = args.dbname
+    if args.host:
+        SCHEMAS["mydb"]["connection"]["host"] = args.host
+    try:
+        db = DatabaseManager()
+    except psycopg2.Error as e:
+        print(f"Ошибка подключения к базе данных: {e}", file=sys.stderr)
+        return 1
+    try:
+        return args.handler(db, args)
+    except (OSError, ValueError, psycopg2.Error) as e:
+        # Ошибки базы (нарушение ограничений, разрыв соединения) — код 1 без трассировки
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
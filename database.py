@@ -0,0 +1,508 @@
+import select
+import threading
+import time
+
+import psycopg2
+
+from repository import Repository, SCHEMAS
+from bulk_io import open_import_source, parquet_writer
+from db_metrics import instrument
+
+class ConflictError(Exception):
+    # Строку изменил другой пользователь; current — её текущее состояние
+    def __init__(self, current):
+        super().__init__("Запись была изменена другим пользователем")
+        self.current = current
+
+def _snapshot_includes(snapshot, txid):
+    # snapshot — txid_current_snapshot() в виде 'xmin:xmax:xip,...': транзакция txid
+    # видна в снимке, если завершилась до него и не входит в список активных
+    xmin, xmax, active = snapshot.split(":")
+    return txid < int(xmin) or (txid < int(xmax) and str(txid) not in active.split(","))
+
+class ShortagesRefresher:
+    # Слушает канал material_shortages (триггер materials_shortages_changed в mydb.txt).
+    # После 'stale <txid>' ждёт delay секунд без новых изменений, так что правки подряд и
+    # массовая загрузка дают одно обновление, и вызывает refresh. Слушателей несколько (по
+    # одному на запущенное приложение), но обновляет один: refresh возвращает None, если
+    # обновление уже идёт в другом процессе, и тогда попытка повторяется, пока 'refreshed
+    # <снимок>' не покажет, что все полученные изменения учтены. На каждое 'refreshed'
+    # вызывается on_refreshed
+    def __init__(self, connection_params, refresh, on_refreshed=None, delay=1.0):
+        self.connection_params = connection_params
+        self.refresh = refresh
+        self.on_refreshed = on_refreshed
+        self.delay = delay
+        self._stopped = threading.Event()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(**self.connection_params)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute("LISTEN material_shortages")
+                # pending — транзакции изменений, ещё не учтённые ни одним обновлением
+                pending = set()
+                due = None
+                while not self._stopped.is_set():
+                    timeout = 5.0 if due is None else max(0.0, due - time.monotonic())
+                    if select.select([connection], [], [], timeout) != ([], [], []):
+                        connection.poll()
+                        while connection.notifies:
+                            kind, _, value = connection.notifies.pop(0).payload.partition(" ")
+                            if kind == "stale":
+                                pending.add(int(value))
+                                due = time.monotonic() + self.delay
+                            elif kind == "refreshed":
+                                pending = {txid for txid in pending if not _snapshot_includes(value, txid)}
+                                if not pending:
+                                    due = None
+                                if self.on_refreshed is not None:
+                                    self.on_refreshed()
+                    if due is not None and time.monotonic() >= due and not self._stopped.is_set():
+                        due = None
+                        if self.refresh() is None:
+                            due = time.monotonic() + self.delay
+            except Exception as e:
+                print(f"Error refreshing material shortages: {e}")
+            finally:
+                if connection is not None:
+                    connection.close()
+            self._stopped.wait(5.0)
+
+    def stop(self):
+        self._stopped.set()
+
+# Время выполнения методов и запросов учитывается в db_metrics.metrics,
+# если сбор включён (DB_METRICS=1); иначе обёртки только проверяют флаг.
+# Весь SQL — именованные запросы схемы mydb в repository.py (SCHEMAS["mydb"]["statements"]),
+# здесь — порядок запросов, транзакции и проверки
+@instrument
+class DatabaseManager:
+    def __init__(self):
+        # Параметры подключения — из описания схемы mydb (cli.py и benchmark.py подменяют dbname)
+        self.connection_params = dict(SCHEMAS["mydb"]["connection"])
+        self.repository = None
+        self.pool = None
+        self.reference = None
+        self.shortages_refresher = None
+        self.connect()
+
+    def connect(self):
+        if self.pool is None:
+            try:
+                # Пул соединений и кэш справочников берутся из общего слоя Repository:
+                # все экземпляры используют один пул процесса, кодировка сессии задаётся
+                # через client_encoding, справочники сбрасываются триггерами через NOTIFY
+                self.repository = Repository("mydb", self.connection_params)
+                self.pool = self.repository.pool
+                self.reference = self.repository.reference
+            except Exception as e:
+                print(f"Error connecting to database: {e}")
+                raise
+
+    def close(self):
+        # Закрывает общий пул, вызывается при выходе из приложения
+        if self.shortages_refresher is not None:
+            self.shortages_refresher.stop()
+            self.shortages_refresher = None
+        if self.pool:
+            self.repository.close()
+            self.repository = None
+            self.pool = None
+            self.reference = None
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def get_materials(self):
+        try:
+            self.connect()
+            return self.repository.fetchall("materials", prepare=False)
+        except Exception as e:
+            print(f"Error getting materials: {e}")
+            raise
+
+    def get_material(self, material_name):
+        return self.repository.fetchone("material", (material_name,))
+
+    def get_materials_page(self, after_key=None, limit=200, filters=None, order=None):
+        # Keyset-пагинация: следующая страница после after_key в порядке material_name
+        # (побайтовое сравнение, чтобы порядок совпадал с порядком строк в Python).
+        # filters: search (подстрока наименования), type, min_price, max_price, below_min.
+        # order: (номер колонки, по убыванию); тогда after_key — (значение колонки, наименование)
+        return self.repository.page("materials_page", after_key, limit, filters, order)
+
+    # Изменяющие методы возвращают затронутую строку в том же виде, что и get_materials_page,
+    # чтобы таблица обновлялась точечно, без повторной загрузки. Последняя колонка строки —
+    # версия (xmin): если передать её в update/delete, изменение выполнится, только пока
+    # строку никто не изменил, иначе будет ConflictError с текущей строкой
+    def add_material(self, name, type_id, price, quantity, min_quantity, package_quantity, unit):
+        return self.repository.fetchone(
+            "add_material", (name, type_id, price, quantity, min_quantity, package_quantity, unit), prepare=False
+        )
+
+    def update_material(self, material_name, type_id, price, quantity, min_quantity, package_quantity, unit, version=None):
+        row = self.repository.fetchone(
+            "update_material",
+            (type_id, price, quantity, min_quantity, package_quantity, unit, material_name, version, version),
+            prepare=False
+        )
+        if row is None and version is not None:
+            self._raise_conflict(self.get_material(material_name))
+        return row
+
+    def delete_material(self, material_name, version=None):
+        row = self.repository.fetchone("delete_material", (material_name, version, version), prepare=False)
+        if row is None and version is not None:
+            self._raise_conflict(self.get_material(material_name))
+        return row
+
+    def _raise_conflict(self, current):
+        # Строка удалена другим пользователем — обновлять нечего, вызывающий получит None
+        if current is not None:
+            raise ConflictError(current)
+
+    # Групповые операции над выделенными строками (Repository.bulk): одна команда на пачку
+    # ключей, все пачки в одной транзакции; progress получает процент выполнения.
+    # Возвращают затронутые строки (для удаления — ключи).
+    # При удалении и смене типа с versions строки, изменённые после загрузки, пропускаются.
+    def delete_materials(self, material_names, versions=None, progress=None):
+        if versions is None:
+            return self.repository.bulk("delete_materials", (), material_names, progress=progress)
+        return self.repository.bulk("delete_materials_versioned", (), material_names, versions, progress)
+
+    def change_material_prices(self, material_names, percent, progress=None):
+        return self.repository.bulk("change_material_prices", (percent,), material_names, progress=progress)
+
+    def set_material_type(self, material_names, type_id, versions=None, progress=None):
+        if versions is None:
+            return self.repository.bulk("set_material_type", (type_id,), material_names, progress=progress)
+        return self.repository.bulk("set_material_type_versioned", (type_id,), material_names, versions, progress)
+
+    # Дефицит материалов хранится в материализованном представлении material_shortages:
+    # вкладка открывается без пересчёта, а после изменения материалов представление
+    # обновляется вызовом refresh_shortages без блокировки чтения (см. watch_shortages)
+    def get_shortages_page(self, after_key=None, limit=200, order=None):
+        return self.repository.page("shortages_page", after_key, limit, order=order)
+
+    def get_shortages_total(self):
+        return self.repository.fetchone("shortages_total", prepare=False)
+
+    def refresh_shortages(self):
+        # Обновляет один процесс: если блокировку держит другой, возвращает None.
+        # Иначе возвращает снимок, с которым обновлено представление: все изменения,
+        # завершённые до него, учтены (он же уходит в уведомлении 'refreshed')
+        repository = self.repository
+        with self.pool.cursor() as cursor:
+            if not repository.fetchone("lock_shortages_refresh", cursor=cursor, prepare=False)[0]:
+                return None
+            snapshot = repository.fetchone("current_snapshot", cursor=cursor, prepare=False)[0]
+            repository.execute("refresh_shortages", cursor=cursor)
+            repository.execute("notify_shortages_refreshed", ("refreshed " + snapshot,), cursor)
+            return snapshot
+
+    def watch_shortages(self, on_refreshed=None, delay=1.0):
+        # Фоновое обновление material_shortages после изменений материалов из любого
+        # процесса (окно, cli.py, другие пользователи); см. ShortagesRefresher
+        if self.shortages_refresher is None:
+            self.shortages_refresher = ShortagesRefresher(
+                self.connection_params, self.refresh_shortages, on_refreshed, delay
+            )
+        return self.shortages_refresher
+
+    def get_material_types(self):
+        return self.reference.get("material_type")
+
+    def invalidate_reference_data(self):
+        self.reference.invalidate()
+
+    def get_products(self):
+        return self.repository.fetchall("products", prepare=False)
+
+    def get_product(self, product_name):
+        return self.repository.fetchone("product", (product_name,))
+
+    def get_products_page(self, after_key=None, limit=200, filters=None, order=None):
+        # filters: search (подстрока наименования или артикула), type, min_price, max_price
+        return self.repository.page("products_page", after_key, limit, filters, order)
+
+    def add_product(self, name, product_type, sku, min_price, roll_width):
+        return self.repository.fetchone(
+            "add_product", (name, product_type, sku, min_price, roll_width), prepare=False
+        )
+
+    def update_product(self, old_name, name, product_type, sku, min_price, roll_width, version=None):
+        row = self.repository.fetchone(
+            "update_product", (name, product_type, sku, min_price, roll_width, old_name, version, version),
+            prepare=False
+        )
+        if row is None and version is not None:
+            self._raise_conflict(self.get_product(old_name))
+        return row
+
+    def delete_product(self, product_name, version=None):
+        row = self.repository.fetchone("delete_product", (product_name, version, version), prepare=False)
+        if row is None and version is not None:
+            self._raise_conflict(self.get_product(product_name))
+        return row
+
+    def delete_products(self, product_names, versions=None, progress=None):
+        if versions is None:
+            return self.repository.bulk("delete_products", (), product_names, progress=progress)
+        return self.repository.bulk("delete_products_versioned", (), product_names, versions, progress)
+
+    def change_product_prices(self, product_names, percent, progress=None):
+        return self.repository.bulk("change_product_prices", (percent,), product_names, progress=progress)
+
+    def set_product_type(self, product_names, product_type, versions=None, progress=None):
+        if versions is None:
+            return self.repository.bulk("set_product_type", (product_type,), product_names, progress=progress)
+        return self.repository.bulk("set_product_type_versioned", (product_type,), product_names, versions, progress)
+
+    def get_product_types(self):
+        return self.reference.get("product_type")
+
+    def get_materials_by_product(self, product_name):
+        return self.repository.fetchall("materials_by_product", (product_name,))
+
+    def get_materials_by_product_page(self, product_name, after_name=None, limit=200):
+        return self.repository.page("materials_by_product_page", after_name, limit, params=(product_name,))
+
+    # Вложенные спецификации: полуфабрикаты из Product_components
+    def get_components(self, product_name):
+        return self.repository.fetchall("components", (product_name,))
+
+    def set_component(self, product_name, component_name, qty_needed):
+        self.repository.execute("set_component", (product_name, component_name, qty_needed))
+
+    def delete_component(self, product_name, component_name):
+        return self.repository.execute("delete_component", (product_name, component_name)) > 0
+
+    def explode_bom(self, product_names):
+        # Суммарный расход материалов на единицу продукции по всем уровням вложенности:
+        # [(продукт, материал, количество)]. Берётся из кэша Product_bom_flat,
+        # недостающие спецификации рассчитываются одним рекурсивным запросом
+        product_names = list(dict.fromkeys(product_names))
+        with self.pool.cursor() as cursor:
+            self._fill_bom_cache(cursor, product_names)
+            return self.repository.fetchall("bom_lines", (product_names,), cursor)
+
+    def _fill_bom_cache(self, cursor, product_names):
+        # Отметка в Product_bom_cache ставится до расчёта: параллельный расчёт той же
+        # продукции дождётся фиксации этой транзакции и пропустит её (ON CONFLICT).
+        # Разделяемые блокировки этой продукции (lock_product_caches в mydb.txt) держатся до
+        # конца транзакции: сброс кэша из триггеров ждёт её фиксации и удаляет рассчитанное
+        # здесь, а заполнение, начатое после изменения состава, ждёт фиксации изменения.
+        # product_names=None — вся продукция
+        repository = self.repository
+        repository.execute("lock_product_caches", (product_names,), cursor)
+        missing = [
+            row[0] for row in
+            repository.fetchall("mark_bom_cache", (product_names, product_names), cursor, prepare=False)
+        ]
+        if not missing:
+            return
+        repository.execute("fill_bom_flat", (missing,), cursor)
+
+    # Себестоимость материалов на единицу продукции: расход по развёрнутой спецификации
+    # с учётом coef типа продукции и процента брака, по текущим ценам материалов.
+    # Результаты хранятся в Product_cost_cache; триггеры сбрасывают только продукцию,
+    # затронутую изменением цен, коэффициентов или состава, и пересчитывается только она.
+    # Цены и коэффициенты читаются под разделяемыми блокировками продукции, которые берёт
+    # _fill_bom_cache в той же транзакции, поэтому изменение цены во время расчёта
+    # дождётся его фиксации и сбросит посчитанную по старой цене себестоимость
+    def update_product_costs(self, product_names=None):
+        with self.pool.cursor() as cursor:
+            self._fill_bom_cache(cursor, product_names)
+            return self.repository.execute("update_product_costs", (product_names, product_names), cursor)
+
+    def get_product_costs(self, product_names):
+        product_names = list(product_names)
+        self.update_product_costs(product_names)
+        return dict(self.repository.fetchall("product_costs", (product_names,)))
+
+    def get_product_costs_page(self, after_key=None, limit=200, order=None):
+        # Страница рассчитанных себестоимостей; перед просмотром вызывается update_product_costs()
+        return self.repository.page("product_costs_page", after_key, limit, order=order)
+
+    # Обратный поиск по составу: в какой продукции используется материал
+    # (индекс product_materials по material_name)
+    def get_products_by_material(self, material_name):
+        return self.repository.fetchall("products_by_material", (material_name,))
+
+    def get_products_by_materials(self, material_names):
+        return self.repository.fetchall("products_by_materials", (list(material_names),))
+
+    def calculate_material_quantity(self, product_type_id, material_type_id, product_qty, param1, param2, stock_qty):
+        try:
+            # Get product type coefficient
+            product_coef = self.reference.lookup("product_type").get(product_type_id)
+            if product_coef is None:
+                return -1
+
+            # Get material defect percent
+            defect_percent = self.reference.lookup("material_type").get(material_type_id)
+            if defect_percent is None:
+                return -1
+
+            # Calculate base quantity needed
+            base_qty = param1 * param2 * product_coef
+            
+            # Calculate total quantity needed with defect percentage
+            total_qty = base_qty * product_qty * (1 + defect_percent/100)
+            
+            # Calculate final quantity needed considering stock
+            final_qty = max(0, total_qty - stock_qty)
+            
+            return int(final_qty)
+        except:
+            return -1
+
+    def calculate_material_quantities(self, product_type_ids, material_type_ids, product_qtys, params1, params2, stock_qtys):
+        # Пакетный вариант calculate_material_quantity: аргументы — последовательности
+        # одинаковой длины, результат — массив int64 с -1 для неизвестных типов
+        # numpy загружается только здесь, чтобы не замедлять запуск командной строки
+        import numpy as np
+        product_coef = self._lookup_array("product_type", product_type_ids)
+        defect_percent = self._lookup_array("material_type", material_type_ids)
+
+        base_qty = np.asarray(params1, dtype=float) * np.asarray(params2, dtype=float) * product_coef
+        total_qty = base_qty * np.asarray(product_qtys, dtype=float) * (1 + defect_percent / 100)
+        final_qty = np.maximum(0, total_qty - np.asarray(stock_qtys, dtype=float))
+
+        # Округление до 6 знаков убирает погрешность float перед отбрасыванием дробной части,
+        # чтобы результат совпадал с расчётом в Decimal
+        return np.where(np.isfinite(final_qty), np.trunc(np.round(final_qty, 6)), -1).astype(np.int64)
+
+    def plan_purchases(self, orders):
+        # Потребность в материалах под производственный план [(продукт, количество), ...]:
+        # разузлование по всем уровням спецификации (кэш Product_bom_flat) с учётом coef
+        # типа заказанной продукции и процента брака
+        # типа материала, за вычетом остатка и с округлением закупки вверх до упаковки.
+        # Продукция, которой нет в базе, не пропускается молча: ValueError со списком
+        totals = {}
+        for product_name, quantity in orders:
+            totals[product_name] = totals.get(product_name, 0) + quantity
+        repository = self.repository
+        with self.pool.cursor() as cursor:
+            unknown = [
+                row[0] for row in repository.fetchall("unknown_products", (list(totals),), cursor, prepare=False)
+            ]
+            if unknown:
+                shown = ", ".join(unknown[:20]) + (" ..." if len(unknown) > 20 else "")
+                raise ValueError(f"Неизвестная продукция ({len(unknown)}): {shown}")
+            self._fill_bom_cache(cursor, list(totals))
+            return repository.fetchall("plan_purchases", (list(totals), list(totals.values())), cursor)
+
+    def import_materials(self, path):
+        return self._import_file(path, "materials", "material_name", MATERIAL_IMPORT_COLUMNS, {
+            "material_type": "material_type",
+            "unit_price": 10, "stock_qty": 10, "min_qty": 10, "pack_qty": 10,
+            "unit": None,
+        })
+
+    def import_products(self, path):
+        return self._import_file(path, "products", "product_name", PRODUCT_IMPORT_COLUMNS, {
+            "product_type": "product_type",
+            "sku": None,
+            "min_price": 10, "roll_width": 4,
+        })
+
+    def _import_file(self, path, table, key, aliases, checks):
+        # Файл целиком передаётся через COPY во временную таблицу, строки с ошибками
+        # помечаются и возвращаются, остальные добавляются/обновляются одной командой
+        # в одной транзакции. checks: колонка -> таблица-справочник, число знаков
+        # целой части для числовых колонок или None для обязательной строки.
+        # Возвращает (число загруженных строк, [(номер строки файла, ключ, причина)]).
+        repository = self.repository
+        file_columns, stream = open_import_source(path, aliases)
+        columns = [key] + list(checks)
+        conditions = [repository.statement("import_check_required", column=key)]
+        values = [repository.statement("import_text_value", column=key)]
+        for column, check in checks.items():
+            if isinstance(check, str):
+                conditions.append(repository.statement("import_check_reference", column=column, reference=check))
+                values.append(repository.statement("import_text_value", column=column))
+            elif check is None:
+                conditions.append(repository.statement("import_check_required", column=column))
+                values.append(repository.statement("import_text_value", column=column))
+            else:
+                conditions.append(repository.statement("import_check_number", column=column, digits=check))
+                values.append(repository.statement("import_number_value", column=column))
+        try:
+            with self.pool.cursor() as cursor:
+                repository.execute(
+                    "import_create", cursor=cursor, columns=", ".join(f"{column} text" for column in columns)
+                )
+                cursor.copy_expert(repository.statement("import_copy", columns=", ".join(file_columns)), stream)
+                repository.execute("import_validate", cursor=cursor, conditions=" ".join(conditions))
+                repository.execute("import_duplicates", cursor=cursor, key=key)
+                imported = repository.execute(
+                    "import_upsert", cursor=cursor, table=table, key=key,
+                    columns=", ".join(columns), values=", ".join(values),
+                    updates=", ".join(f"{column} = EXCLUDED.{column}" for column in columns[1:])
+                )
+                return imported, repository.fetchall("import_errors", cursor=cursor, prepare=False, key=key)
+        finally:
+            stream.close()
+
+    def export_table(self, table, path):
+        # Потоковая выгрузка: CSV пишется сервером через COPY TO STDOUT, Parquet — пачками
+        # из именованного (серверного) курсора, так что память не зависит от объёма таблицы.
+        # Возвращает число выгруженных строк.
+        query = self.repository.statement(f"export_{table}")
+        if path.lower().endswith(".parquet"):
+            with self.pool.connection() as connection:
+                with connection.cursor(name=f"export_{table}") as cursor:
+                    cursor.itersize = 50000
+                    cursor.execute(query)
+                    rows = cursor.fetchmany(cursor.itersize)
+                    write, close = parquet_writer(path, cursor.description)
+                    exported = 0
+                    try:
+                        while rows:
+                            write(rows)
+                            exported += len(rows)
+                            rows = cursor.fetchmany(cursor.itersize)
+                    finally:
+                        close()
+                    return exported
+        with open(path, "w", encoding="utf-8-sig", newline="") as output:
+            with self.pool.cursor() as cursor:
+                cursor.copy_expert(self.repository.statement("export_copy", query=query), output)
+                return cursor.rowcount
+
+    def _lookup_array(self, reference_name, keys):
+        # Коэффициенты ищутся один раз на каждый уникальный тип, неизвестным — NaN
+        import numpy as np
+        values = self.reference.lookup(reference_name)
+        unique_keys, inverse = np.unique(np.asarray(keys, dtype=object).astype(str), return_inverse=True)
+        unique_values = np.array([float(values.get(key, np.nan)) for key in unique_keys])
+        return unique_values[inverse]
+
+# Колонки файлов импорта: имена колонок таблиц или заголовки таблиц приложения
+MATERIAL_IMPORT_COLUMNS = {
+    "material_name": "material_name", "наименование": "material_name",
+    "material_type": "material_type", "тип": "material_type",
+    "unit_price": "unit_price", "цена": "unit_price",
+    "stock_qty": "stock_qty", "количество": "stock_qty",
+    "min_qty": "min_qty", "мин. количество": "min_qty",
+    "pack_qty": "pack_qty", "в упаковке": "pack_qty",
+    "unit": "unit", "ед. измерения": "unit",
+}
+
+PRODUCT_IMPORT_COLUMNS = {
+    "product_name": "product_name", "наименование": "product_name",
+    "product_type": "product_type", "тип": "product_type",
+    "sku": "sku", "артикул": "sku",
+    "min_price": "min_price", "мин. цена": "min_price",
+    "roll_width": "roll_width", "ширина рулона": "roll_width",
+}
+
+# Таблицы, которые выгружает export_table (запросы export_<таблица> схемы mydb)
+EXPORT_TABLES = ("materials", "products", "product_materials")
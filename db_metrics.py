@@ -0,0 +1,264 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2.extensions
+
+logger = logging.getLogger("db_metrics")
+
+# Границы интервалов гистограмм времени выполнения, в секундах
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class _Stats:
+    def __init__(self):
+        self.duration = Histogram()
+        self.rows = 0
+        self.errors = 0
+
+
+def redact(params):
+    # В журнал медленных запросов попадают только типы параметров, не значения
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        if len(params) > 20:
+            return f"<{type(params).__name__}[{len(params)}]>"
+        return [redact(value) for value in params]
+    return f"<{type(params).__name__}>"
+
+
+class Metrics:
+    # Время выполнения и число строк по методам DatabaseManager и по запросам внутри них,
+    # журнал медленных запросов. Выключено по умолчанию: обёртки методов и курсор тогда
+    # только проверяют флаг enabled
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = 200.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._methods = {}
+        self._queries = {}
+        self.slow_queries = deque(maxlen=200)
+
+    def enable(self, slow_query_ms=None):
+        if slow_query_ms is not None:
+            self.slow_query_ms = slow_query_ms
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+            self._queries = {}
+            self.slow_queries.clear()
+
+    def current_method(self):
+        stack = getattr(self._local, "methods", None)
+        return stack[-1] if stack else "-"
+
+    def call(self, method, function, args, kwargs):
+        stack = getattr(self._local, "methods", None)
+        if stack is None:
+            stack = self._local.methods = []
+        stack.append(method)
+        started = time.perf_counter()
+        error = False
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            rows = len(result) if isinstance(result, (list, tuple, dict)) else 0
+            with self._lock:
+                stats = self._methods.get(method)
+                if stats is None:
+                    stats = self._methods[method] = _Stats()
+                stats.duration.observe(elapsed)
+                stats.rows += rows
+                stats.errors += error
+
+    def record_query(self, query, params, elapsed, rowcount, error):
+        method = self.current_method()
+        with self._lock:
+            stats = self._queries.get(method)
+            if stats is None:
+                stats = self._queries[method] = _Stats()
+            stats.duration.observe(elapsed)
+            stats.rows += max(rowcount, 0)
+            stats.errors += error
+        if elapsed * 1000 >= self.slow_query_ms:
+            if isinstance(query, bytes):
+                query = query.decode("utf-8", "replace")
+            entry = {
+                "method": method,
+                "query": " ".join(str(query).split()),
+                "params": redact(params),
+                "duration_ms": round(elapsed * 1000, 3),
+                "rows": rowcount,
+                "at": time.time(),
+            }
+            self.slow_queries.append(entry)
+            logger.warning("Медленный запрос %.1f мс в %s: %s", entry["duration_ms"], method, entry["query"])
+
+    def snapshot(self):
+        def stats_dict(stats):
+            return {
+                "count": stats.duration.count,
+                "sum_seconds": stats.duration.sum,
+                "buckets": {str(bound): count for bound, count in stats.duration.cumulative()},
+                "rows": stats.rows,
+                "errors": stats.errors,
+            }
+        with self._lock:
+            return {
+                "methods": {name: stats_dict(stats) for name, stats in self._methods.items()},
+                "queries": {name: stats_dict(stats) for name, stats in self._queries.items()},
+                "slow_queries": list(self.slow_queries),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for prefix, source in (("db_method", self._methods), ("db_query", self._queries)):
+                lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+                for name, stats in sorted(source.items()):
+                    for bound, count in stats.duration.cumulative():
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{prefix}_duration_seconds_bucket{{method="{name}",le="{le}"}} {count}')
+                    lines.append(f'{prefix}_duration_seconds_sum{{method="{name}"}} {stats.duration.sum}')
+                    lines.append(f'{prefix}_duration_seconds_count{{method="{name}"}} {stats.duration.count}')
+                lines.append(f"# TYPE {prefix}_rows_total counter")
+                for name, stats in sorted(source.items()):
+                    lines.append(f'{prefix}_rows_total{{method="{name}"}} {stats.rows}')
+                lines.append(f"# TYPE {prefix}_errors_total counter")
+                for name, stats in sorted(source.items()):
+                    lines.append(f'{prefix}_errors_total{{method="{name}"}} {stats.errors}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # .prom — текстовый формат Prometheus (для textfile collector), иначе JSON
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(text)
+
+
+metrics = Metrics()
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    # Курсор для cursor_factory в параметрах подключения: время каждого запроса
+    # учитывается за методом DatabaseManager, из которого он выполнен
+    def execute(self, query, vars=None):
+        if not metrics.enabled:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception:
+            metrics.record_query(query, vars, time.perf_counter() - started, -1, True)
+            raise
+        metrics.record_query(query, vars, time.perf_counter() - started, self.rowcount, False)
+        return result
+
+    def executemany(self, query, vars_list):
+        if not metrics.enabled:
+            return super().executemany(query, vars_list)
+        vars_list = list(vars_list)
+        started = time.perf_counter()
+        try:
+            result = super().executemany(query, vars_list)
+        except Exception:
+            metrics.record_query(query, vars_list, time.perf_counter() - started, -1, True)
+            raise
+        metrics.record_query(query, vars_list, time.perf_counter() - started, self.rowcount, False)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        if not metrics.enabled:
+            return super().copy_expert(sql, file, size)
+        started = time.perf_counter()
+        try:
+            result = super().copy_expert(sql, file, size)
+        except Exception:
+            metrics.record_query(sql, None, time.perf_counter() - started, -1, True)
+            raise
+        metrics.record_query(sql, None, time.perf_counter() - started, self.rowcount, False)
+        return result
+
+
+def instrument(cls):
+    # Декоратор класса: открытые методы учитываются в metrics под именем Класс.метод
+    for name, function in list(vars(cls).items()):
+        if name.startswith("_") or not callable(function) or getattr(function, "not_instrumented", False):
+            continue
+        setattr(cls, name, _instrumented(f"{cls.__name__}.{name}", function))
+    return cls
+
+
+def not_instrumented(function):
+    # Открытый вспомогательный метод (выполнение запроса по имени): его запросы
+    # учитываются за вызвавшим методом, а не за ним самим
+    function.not_instrumented = True
+    return function
+
+
+def _instrumented(method, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not metrics.enabled:
+            return function(*args, **kwargs)
+        return metrics.call(method, function, args, kwargs)
+    return wrapper
+
+
+def enable_from_environment():
+    # DB_METRICS=1 включает сбор, DB_SLOW_QUERY_MS задаёт порог медленного запроса,
+    # DB_METRICS_FILE — файл (.json или .prom), в который метрики пишутся при выходе
+    if os.environ.get("DB_METRICS", "") in ("", "0"):
+        return
+    slow_query_ms = os.environ.get("DB_SLOW_QUERY_MS")
+    metrics.enable(float(slow_query_ms) if slow_query_ms else None)
+    path = os.environ.get("DB_METRICS_FILE")
+    if path:
+        atexit.register(metrics.write, path)
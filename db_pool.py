@@ -0,0 +1,313 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+from db_metrics import metrics
+
+# Серверные подготовленные запросы в execute_prepared; DB_PREPARED_STATEMENTS=0 отключает их
+PREPARE_STATEMENTS = os.environ.get("DB_PREPARED_STATEMENTS", "1") != "0"
+
+
+class PoolError(Exception):
+    pass
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    # Соединение пула помнит подготовленные на нём запросы: {текст запроса: имя}.
+    # Соединение, открытое взамен разорванного, начинает с пустого списка
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = {}
+
+
+class ConnectionPool:
+    def __init__(self, connection_params, minconn=1, maxconn=10,
+                 checkout_timeout=30.0, max_idle=300.0, health_check_after=30.0):
+        self.connection_params = dict(connection_params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        # Соединения сверх minconn, простаивающие дольше max_idle секунд, закрываются
+        self.max_idle = max_idle
+        # Соединение, простоявшее дольше этого времени, проверяется запросом SELECT 1
+        self.health_check_after = health_check_after
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []  # [(connection, время возврата в пул)]
+        self._in_use = set()
+        # Соединения, которые открываются, проверяются или возвращаются в пул вне блокировки:
+        # место под них занято, но ни в _idle, ни в _in_use их нет
+        self._pending = 0
+        self._closed = False
+        self._metrics = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "reaped": 0,
+        }
+
+        with self._lock:
+            for _ in range(self.minconn):
+                self._idle.append((self._new_connection(), time.monotonic()))
+                self._metrics["created"] += 1
+
+    def _new_connection(self):
+        return psycopg2.connect(connection_factory=PooledConnection, **self.connection_params)
+
+    def _close_connection(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _discard(self, connection):
+        # Вызывается под блокировкой
+        self._close_connection(connection)
+        self._metrics["closed"] += 1
+
+    def _is_healthy(self, connection, idle_for):
+        if connection.closed:
+            return False
+        if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reap_idle(self, now):
+        # Вызывается под блокировкой; самые старые соединения лежат в начале списка
+        while len(self._idle) + len(self._in_use) > self.minconn and self._idle:
+            connection, released_at = self._idle[0]
+            if now - released_at < self.max_idle:
+                break
+            self._idle.pop(0)
+            self._discard(connection)
+            self._metrics["reaped"] += 1
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_from = None
+        while True:
+            candidate = None
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolError("Пул соединений закрыт")
+                    now = time.monotonic()
+                    self._reap_idle(now)
+                    if self._idle:
+                        candidate, released_at = self._idle.pop()
+                        break
+                    if len(self._in_use) + self._pending < self.maxconn:
+                        break
+
+                    if waited_from is None:
+                        waited_from = now
+                        self._metrics["waits"] += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise PoolTimeout(f"Нет свободных соединений (максимум {self.maxconn})")
+                    self._available.wait(remaining)
+                # Проверка и открытие соединения идут вне блокировки, место под него уже занято
+                self._pending += 1
+
+            if candidate is None:
+                break
+            if self._is_healthy(candidate, now - released_at):
+                with self._lock:
+                    self._pending -= 1
+                    return self._checked_out(candidate, time.monotonic(), waited_from)
+            self._close_connection(candidate)
+            with self._lock:
+                self._pending -= 1
+                self._metrics["health_check_failures"] += 1
+                self._metrics["closed"] += 1
+                self._available.notify()
+
+        try:
+            connection = self._new_connection()
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self._pending -= 1
+            self._metrics["created"] += 1
+            return self._checked_out(connection, time.monotonic(), waited_from)
+
+    def _checked_out(self, connection, now, waited_from):
+        self._in_use.add(connection)
+        self._metrics["checkouts"] += 1
+        if waited_from is not None:
+            self._metrics["wait_time"] += now - waited_from
+        return connection
+
+    def putconn(self, connection, discard=False):
+        with self._lock:
+            self._in_use.discard(connection)
+            self._pending += 1
+            keep = not (self._closed or discard or connection.closed)
+
+        # Откат незавершённой транзакции и закрытие — сетевые операции, они идут вне блокировки
+        if keep and connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Exception:
+                keep = False
+        if not keep:
+            self._close_connection(connection)
+
+        with self._lock:
+            self._pending -= 1
+            if keep and not self._closed:
+                now = time.monotonic()
+                self._idle.append((connection, now))
+                self._reap_idle(now)
+            elif keep:
+                self._discard(connection)
+            else:
+                self._metrics["closed"] += 1
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        # При ошибке putconn откатывает транзакцию и возвращает соединение в пул вместе
+        # с подготовленными на нём запросами. OperationalError — это и отмена запроса,
+        # и взаимоблокировка, и ошибка сериализации, поэтому закрывается только соединение,
+        # которое psycopg2 пометил разорванным (connection.closed)
+        connection = self.getconn()
+        try:
+            yield connection
+            connection.commit()
+        finally:
+            self.putconn(connection)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                yield cursor
+
+    def reap(self):
+        with self._lock:
+            self._reap_idle(time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "size": len(self._idle) + len(self._in_use),
+            })
+            return stats
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for connection, _ in self._idle:
+                self._discard(connection)
+            self._idle = []
+            self._available.notify_all()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+_placeholder = re.compile(r"%%|%s")
+
+
+def _numbered_placeholders(query):
+    # %s -> $1, $2, ... для PREPARE; %% -> %, как при подстановке параметров psycopg2
+    numbers = iter(range(1, query.count("%s") + 1))
+    return _placeholder.sub(lambda match: "%" if match.group() == "%%" else f"${next(numbers)}", query)
+
+
+def execute_prepared(cursor, query, params=()):
+    # Выполняет запрос с параметрами %s как серверный подготовленный: при первом вызове
+    # на соединении запрос разбирается (PREPARE), дальше выполняется через EXECUTE, и
+    # PostgreSQL не разбирает и не планирует его заново. Подготовленный запрос живёт,
+    # пока открыто соединение, поэтому после переподключения он готовится снова
+    prepared = getattr(cursor.connection, "prepared", None)
+    if prepared is None or not PREPARE_STATEMENTS:
+        cursor.execute(query, params)
+        return
+    # PREPARE и EXECUTE идут мимо InstrumentedCursor: в метрики попадает исходный текст
+    # запроса и один вызов, а не служебные команды с именем prepared_<md5>
+    started = time.perf_counter()
+    try:
+        _execute_named(cursor, prepared, query, params)
+    except Exception:
+        if metrics.enabled:
+            metrics.record_query(query, params, time.perf_counter() - started, -1, True)
+        raise
+    if metrics.enabled:
+        metrics.record_query(query, params, time.perf_counter() - started, cursor.rowcount, False)
+
+
+def _execute_named(cursor, prepared, query, params):
+    execute = psycopg2.extensions.cursor.execute
+    name = prepared.get(query)
+    if name is None:
+        name = "prepared_" + hashlib.md5(query.encode("utf-8")).hexdigest()[:16]
+        execute(cursor, f"PREPARE {name} AS {_numbered_placeholders(query)}")
+        prepared[query] = name
+    arguments = f" ({', '.join(['%s'] * len(params))})" if params else ""
+    try:
+        execute(cursor, f"EXECUTE {name}{arguments}", params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # Запрос удалён на сервере (DEALLOCATE / DISCARD ALL): подготовить заново при следующем вызове
+        del prepared[query]
+        raise
+
+
+def get_pool(minconn=1, maxconn=10, **connection_params):
+    # Один пул на процесс для каждого набора параметров подключения;
+    # размеры пула задаёт тот, кто создаёт его первым
+    key = tuple(sorted(connection_params.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(connection_params, minconn=minconn, maxconn=maxconn)
+            _pools[key] = pool
+        return pool
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.connection_params.get("dbname"): pool.stats() for pool in pools}
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,116 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+    progress = pyqtSignal(object, int)
+
+
+class DbTask(QRunnable):
+    def __init__(self, fn, args, kwargs, on_result=None, on_error=None, tag=None, on_progress=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.tag = tag
+        self.cancelled = False
+        self.signals = TaskSignals()
+        if on_progress is not None:
+            self.kwargs["progress"] = self.report_progress
+
+    def report_progress(self, percent):
+        self.signals.progress.emit(self, percent)
+
+    def run(self):
+        if self.cancelled:
+            self.signals.finished.emit(self, None)
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+        else:
+            self.signals.finished.emit(self, result)
+
+
+class DbExecutor(QObject):
+    # Выполняет вызовы DatabaseManager в пуле потоков; колбэки вызываются в потоке GUI.
+    # Задача с тем же tag, что и у более новой, считается устаревшей: если она ещё
+    # в очереди, она снимается, а если уже выполняется, её результат отбрасывается.
+    # Если передан on_progress, функция получает аргумент progress(процент).
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max_threads)
+        self._tasks = set()
+        self._latest = {}
+
+    def submit(self, fn, *args, on_result=None, on_error=None, tag=None, on_progress=None, **kwargs):
+        task = DbTask(fn, args, kwargs, on_result, on_error, tag, on_progress)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        task.signals.progress.connect(self._on_progress)
+        if tag is not None:
+            previous = self._latest.get(tag)
+            if previous is not None:
+                self.cancel(previous)
+            self._latest[tag] = task
+        self._tasks.add(task)
+        if len(self._tasks) == 1:
+            self.busy_changed.emit(True)
+        self.thread_pool.start(task)
+        return task
+
+    def cancel(self, task):
+        task.cancelled = True
+        if self.thread_pool.tryTake(task):
+            self._forget(task)
+
+    def is_busy(self):
+        return bool(self._tasks)
+
+    def wait(self, msecs=-1):
+        return self.thread_pool.waitForDone(msecs)
+
+    def _forget(self, task):
+        if self._latest.get(task.tag) is task:
+            del self._latest[task.tag]
+        if task in self._tasks:
+            self._tasks.discard(task)
+            if not self._tasks:
+                self.busy_changed.emit(False)
+
+    def _on_finished(self, task, result):
+        self._forget(task)
+        if not task.cancelled and task.on_result is not None:
+            task.on_result(result)
+
+    def _on_progress(self, task, percent):
+        if not task.cancelled and task.on_progress is not None:
+            task.on_progress(percent)
+
+    def _on_failed(self, task, error):
+        self._forget(task)
+        if task.cancelled:
+            return
+        if task.on_error is not None:
+            task.on_error(error)
+        else:
+            print(f"Error in background query: {error}")
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = DbExecutor()
+    return _executor
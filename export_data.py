@@ -0,0 +1,7 @@
+import sys
+
+import cli
+
+# Прежняя точка входа выгрузки: python export_data.py ТАБЛИЦА ФАЙЛ — то же, что python cli.py export
+if __name__ == "__main__":
+    sys.exit(cli.main(["export"] + sys.argv[1:]))
@@ -0,0 +1,91 @@
+import select
+import threading
+import time
+
+import psycopg2
+
+
+class ReferenceCache:
+    # Кэш редко меняющихся справочников (типы материалов и продукции).
+    # queries: {имя справочника: SELECT ключ, значение, ...}. Записи живут ttl секунд,
+    # сбрасываются вызовом invalidate() или уведомлением NOTIFY на канале channel,
+    # в payload которого передаётся имя изменённой таблицы.
+    def __init__(self, pool, queries, ttl=300.0, channel=None):
+        self.pool = pool
+        self.queries = queries
+        self.ttl = ttl
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._entries = {}  # имя -> (строки, словарь ключ -> значение, время загрузки)
+        self._stopped = threading.Event()
+        self._listener = None
+        if channel:
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+
+    def _entry(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or time.monotonic() - entry[2] > self.ttl:
+                with self.pool.cursor() as cursor:
+                    cursor.execute(self.queries[name])
+                    rows = tuple(cursor.fetchall())
+                entry = (rows, {row[0]: row[1] for row in rows}, time.monotonic())
+                self._entries[name] = entry
+            return entry
+
+    def get(self, name):
+        return self._entry(name)[0]
+
+    def lookup(self, name):
+        return self._entry(name)[1]
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(**self.pool.connection_params)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                # Пока не было подписки, уведомления могли быть пропущены
+                self.invalidate()
+                while not self._stopped.is_set():
+                    if select.select([connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        self.invalidate(notify.payload or None)
+            except Exception as e:
+                print(f"Error listening for reference data changes: {e}")
+            finally:
+                if connection is not None:
+                    connection.close()
+            self._stopped.wait(5.0)
+
+    def stop(self):
+        self._stopped.set()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_reference_cache(pool, queries, ttl=300.0, channel=None):
+    # Один кэш на пул соединений, общий для всех экземпляров DatabaseManager
+    with _caches_lock:
+        cache = _caches.get(id(pool))
+        if cache is None or cache.pool is not pool:
+            if cache is not None:
+                cache.stop()
+            cache = ReferenceCache(pool, queries, ttl, channel)
+            _caches[id(pool)] = cache
+        return cache
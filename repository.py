@@ -0,0 +1,658 @@
+from contextlib import contextmanager
+
+from db_pool import get_pool, execute_prepared
+from ref_cache import get_reference_cache
+from db_metrics import InstrumentedCursor, instrument, not_instrumented
+
+# Описание схем баз данных — здесь записаны все запросы приложения к базе.
+# connection — параметры подключения (cli.py и benchmark.py подменяют в нём dbname и host);
+# pool — размеры пула соединений (minconn, maxconn); references — запросы справочников для
+# ReferenceCache (ключ — имя таблицы, оно же payload уведомления на канале channel);
+# material_types/product_types — (справочник, номер колонки с названием типа);
+# statements — именованные запросы. В тексте запроса {имя} заменяется фрагментом, который
+# передаёт вызывающий (Repository.statement); страничные запросы (Repository.page) получают
+# {keyset} — условие продолжения после ключа, {filters} — условия фильтров и {order_by};
+# sort_columns — выражения сортировки по колонкам страничного запроса (первое — ключ),
+# filters — колонки фильтров страничного запроса: search (подстрока, ILIKE по любой из
+# колонок), type (равенство), price (диапазон min_price..max_price), below_min (условие).
+# Запрос или фильтр, не описанный для схемы, — LookupError.
+# Строки схемы furniture (app2.py, app3.py):
+#   materials_page       (id, наименование, тип, цена, количество, мин. количество, ед. измерения)
+#   material             (id, наименование, id типа, цена, количество, мин. количество,
+#                         в упаковке, ед. измерения)
+#   products_page        (id, наименование, тип, мин. цена)
+#   products_by_material (наименование продукции, количество)
+#   partners             (id, наименование, телефон, email)
+# Строки схемы mydb описаны в DatabaseManager (database.py), который выполняет эти
+# запросы через Repository: ключ — наименование, последняя колонка материалов
+# и продукции — версия строки (xmin)
+MATERIAL_COLUMNS = "material_name, material_type, unit_price, stock_qty, min_qty, pack_qty, unit, xmin::text"
+PRODUCT_COLUMNS = "product_name, product_type, sku, min_price, roll_width, xmin::text"
+
+SCHEMAS = {
+    "mydb": {
+        "connection": {
+            "dbname": "mydb",
+            "user": "postgres",
+            "password": "123",
+            "host": "localhost",
+            "client_encoding": "utf8",
+            "cursor_factory": InstrumentedCursor
+        },
+        "pool": {"minconn": 1, "maxconn": 10},
+        "references": {
+            "material_type": "SELECT material_type, defect_percent FROM material_type",
+            "product_type": "SELECT product_type, coef FROM product_type",
+        },
+        "channel": "reference_data_changed",
+        "material_types": ("material_type", 0),
+        "product_types": ("product_type", 0),
+        # Строковые колонки сравниваются побайтово (COLLATE "C"), чтобы порядок совпадал
+        # с порядком строк в Python (LazyTableModel)
+        "sort_columns": {
+            "materials_page": [
+                'm.material_name COLLATE "C"', 'm.material_type COLLATE "C"', "m.unit_price",
+                "m.stock_qty", "m.min_qty", "m.pack_qty", 'm.unit COLLATE "C"'
+            ],
+            "products_page": [
+                'p.product_name COLLATE "C"', 'p.product_type COLLATE "C"', 'p.sku COLLATE "C"',
+                "p.min_price", "p.roll_width"
+            ],
+            "shortages_page": [
+                's.material_name COLLATE "C"', 's.material_type COLLATE "C"', "s.stock_qty", "s.min_qty",
+                "s.deficit", "s.packs_to_order", "s.cost", 's.unit COLLATE "C"'
+            ],
+            "product_costs_page": [
+                'c.product_name COLLATE "C"', 'p.product_type COLLATE "C"', "ROUND(c.material_cost, 2)",
+                "p.min_price", "ROUND(p.min_price - c.material_cost, 2)"
+            ],
+            "materials_by_product_page": ['pm.material_name COLLATE "C"'],
+        },
+        "filters": {
+            "materials_page": {
+                "search": ["m.material_name"], "type": "m.material_type", "price": "m.unit_price",
+                "below_min": "m.stock_qty < m.min_qty",
+            },
+            "products_page": {
+                "search": ["p.product_name", "p.sku"], "type": "p.product_type", "price": "p.min_price",
+            },
+        },
+        "statements": {
+            # Материалы
+            "materials": """
+                SELECT m.material_name, mt.material_type, m.unit_price,
+                       m.stock_qty, m.min_qty, m.pack_qty, m.unit
+                FROM materials m
+                JOIN material_type mt ON m.material_type = mt.material_type
+            """,
+            "material": """
+                SELECT m.material_name, mt.material_type, m.unit_price,
+                       m.stock_qty, m.min_qty, m.pack_qty, m.unit, m.xmin::text
+                FROM materials m
+                JOIN material_type mt ON m.material_type = mt.material_type
+                WHERE m.material_name = %s
+            """,
+            "materials_page": """
+                SELECT m.material_name, mt.material_type, m.unit_price,
+                       m.stock_qty, m.min_qty, m.pack_qty, m.unit, m.xmin::text
+                FROM materials m
+                JOIN material_type mt ON m.material_type = mt.material_type
+                WHERE {keyset}{filters}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+            # Изменение с версией (xmin) выполняется, только пока строку никто не изменил;
+            # версия NULL — без проверки
+            "add_material": (
+                "INSERT INTO materials (material_name, material_type, unit_price, stock_qty, min_qty, pack_qty, unit)"
+                " VALUES (%s, %s, %s, %s, %s, %s, %s)"
+                f" RETURNING {MATERIAL_COLUMNS}"
+            ),
+            "update_material": (
+                "UPDATE materials SET material_type = %s, unit_price = %s, stock_qty = %s, min_qty = %s, pack_qty = %s, unit = %s"
+                " WHERE material_name = %s AND (%s::text IS NULL OR xmin::text = %s)"
+                f" RETURNING {MATERIAL_COLUMNS}"
+            ),
+            "delete_material": (
+                "DELETE FROM materials WHERE material_name = %s AND (%s::text IS NULL OR xmin::text = %s)"
+                " RETURNING material_name"
+            ),
+            # Групповые операции (Repository.bulk): последние параметры — пачка ключей
+            # и, для *_versioned, их версии
+            "delete_materials": "DELETE FROM materials WHERE material_name = ANY(%s) RETURNING material_name",
+            "delete_materials_versioned": (
+                "DELETE FROM materials m USING unnest(%s::varchar[], %s::text[]) AS k(name, version)"
+                " WHERE m.material_name = k.name AND m.xmin::text = k.version RETURNING m.material_name"
+            ),
+            "change_material_prices": (
+                "UPDATE materials SET unit_price = ROUND(unit_price * (100 + %s) / 100, 2) WHERE material_name = ANY(%s)"
+                f" RETURNING {MATERIAL_COLUMNS}"
+            ),
+            "set_material_type": (
+                "UPDATE materials SET material_type = %s WHERE material_name = ANY(%s)"
+                f" RETURNING {MATERIAL_COLUMNS}"
+            ),
+            "set_material_type_versioned": (
+                "UPDATE materials m SET material_type = %s FROM unnest(%s::varchar[], %s::text[]) AS k(name, version)"
+                " WHERE m.material_name = k.name AND m.xmin::text = k.version"
+                " RETURNING m.material_name, m.material_type, m.unit_price, m.stock_qty, m.min_qty, m.pack_qty,"
+                " m.unit, m.xmin::text"
+            ),
+
+            # Дефицит материалов (материализованное представление material_shortages)
+            "shortages_page": """
+                SELECT s.material_name, s.material_type, s.stock_qty, s.min_qty, s.deficit,
+                       s.packs_to_order, s.cost, s.unit
+                FROM material_shortages s
+                WHERE {keyset}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+            "shortages_total": "SELECT COUNT(*), COALESCE(SUM(cost), 0) FROM material_shortages",
+            "lock_shortages_refresh": "SELECT pg_try_advisory_xact_lock(hashtext('material_shortages'))",
+            "current_snapshot": "SELECT txid_current_snapshot()::text",
+            "refresh_shortages": "REFRESH MATERIALIZED VIEW CONCURRENTLY material_shortages",
+            "notify_shortages_refreshed": "SELECT pg_notify('material_shortages', %s)",
+
+            # Продукция
+            "products": """
+                SELECT p.product_name, pt.product_type, p.sku, p.min_price, p.roll_width
+                FROM products p
+                JOIN product_type pt ON p.product_type = pt.product_type
+            """,
+            "product": """
+                SELECT p.product_name, pt.product_type, p.sku, p.min_price, p.roll_width, p.xmin::text
+                FROM products p
+                JOIN product_type pt ON p.product_type = pt.product_type
+                WHERE p.product_name = %s
+            """,
+            "products_page": """
+                SELECT p.product_name, pt.product_type, p.sku, p.min_price, p.roll_width, p.xmin::text
+                FROM products p
+                JOIN product_type pt ON p.product_type = pt.product_type
+                WHERE {keyset}{filters}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+            "add_product": (
+                "INSERT INTO products (product_name, product_type, sku, min_price, roll_width) VALUES (%s, %s, %s, %s, %s)"
+                f" RETURNING {PRODUCT_COLUMNS}"
+            ),
+            "update_product": (
+                "UPDATE products SET product_name = %s, product_type = %s, sku = %s, min_price = %s, roll_width = %s"
+                " WHERE product_name = %s AND (%s::text IS NULL OR xmin::text = %s)"
+                f" RETURNING {PRODUCT_COLUMNS}"
+            ),
+            "delete_product": (
+                "DELETE FROM products WHERE product_name = %s AND (%s::text IS NULL OR xmin::text = %s)"
+                " RETURNING product_name"
+            ),
+            "delete_products": "DELETE FROM products WHERE product_name = ANY(%s) RETURNING product_name",
+            "delete_products_versioned": (
+                "DELETE FROM products p USING unnest(%s::varchar[], %s::text[]) AS k(name, version)"
+                " WHERE p.product_name = k.name AND p.xmin::text = k.version RETURNING p.product_name"
+            ),
+            "change_product_prices": (
+                "UPDATE products SET min_price = ROUND(min_price * (100 + %s) / 100, 2) WHERE product_name = ANY(%s)"
+                f" RETURNING {PRODUCT_COLUMNS}"
+            ),
+            "set_product_type": (
+                "UPDATE products SET product_type = %s WHERE product_name = ANY(%s)"
+                f" RETURNING {PRODUCT_COLUMNS}"
+            ),
+            "set_product_type_versioned": (
+                "UPDATE products p SET product_type = %s FROM unnest(%s::varchar[], %s::text[]) AS k(name, version)"
+                " WHERE p.product_name = k.name AND p.xmin::text = k.version"
+                " RETURNING p.product_name, p.product_type, p.sku, p.min_price, p.roll_width, p.xmin::text"
+            ),
+
+            # Состав продукции и вложенные спецификации
+            "materials_by_product": """
+                SELECT m.material_name, pm.qty_needed
+                FROM product_materials pm
+                JOIN materials m ON pm.material_name = m.material_name
+                WHERE pm.product_name = %s
+            """,
+            "materials_by_product_page": """
+                SELECT pm.material_name, pm.qty_needed
+                FROM product_materials pm
+                WHERE pm.product_name = %s
+                  AND {keyset}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+            "products_by_material": """
+                SELECT pm.product_name, pm.qty_needed
+                FROM product_materials pm
+                WHERE pm.material_name = %s
+                ORDER BY pm.product_name
+            """,
+            "products_by_materials": """
+                SELECT pm.material_name, pm.product_name, pm.qty_needed
+                FROM product_materials pm
+                WHERE pm.material_name = ANY(%s)
+                ORDER BY pm.material_name, pm.product_name
+            """,
+            "components": """
+                SELECT pc.component_name, pc.qty_needed
+                FROM product_components pc
+                WHERE pc.product_name = %s
+                ORDER BY pc.component_name
+            """,
+            "set_component": """
+                INSERT INTO product_components (product_name, component_name, qty_needed)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (product_name, component_name) DO UPDATE SET qty_needed = EXCLUDED.qty_needed
+            """,
+            "delete_component": "DELETE FROM product_components WHERE product_name = %s AND component_name = %s",
+
+            # Кэш развёрнутых спецификаций и себестоимости (DatabaseManager._fill_bom_cache).
+            # Запросы с "%s IS NULL OR ..." выполняются без подготовки: общий план
+            # подготовленного запроса не использовал бы индекс
+            "lock_product_caches": "SELECT lock_product_caches(%s::varchar[], FALSE)",
+            "mark_bom_cache": """
+                INSERT INTO product_bom_cache (product_name)
+                SELECT p.product_name FROM products p
+                WHERE (%s::varchar[] IS NULL OR p.product_name = ANY(%s))
+                  AND NOT EXISTS (SELECT 1 FROM product_bom_cache c WHERE c.product_name = p.product_name)
+                ORDER BY p.product_name
+                ON CONFLICT DO NOTHING
+                RETURNING product_name
+            """,
+            "fill_bom_flat": """
+                WITH RECURSIVE tree(root, product_name, factor, path) AS (
+                    SELECT p, p, 1::numeric, ARRAY[p] FROM unnest(%s::varchar[]) AS p
+                    UNION ALL
+                    SELECT t.root, pc.component_name, t.factor * pc.qty_needed, t.path || pc.component_name
+                    FROM tree t
+                    JOIN product_components pc ON pc.product_name = t.product_name
+                    WHERE pc.component_name <> ALL(t.path)
+                )
+                INSERT INTO product_bom_flat (product_name, material_name, qty_needed)
+                SELECT t.root, pm.material_name, SUM(t.factor * pm.qty_needed)
+                FROM tree t
+                JOIN product_materials pm ON pm.product_name = t.product_name
+                GROUP BY t.root, pm.material_name
+            """,
+            "bom_lines": """
+                SELECT f.product_name, f.material_name, f.qty_needed
+                FROM product_bom_flat f
+                WHERE f.product_name = ANY(%s)
+                ORDER BY f.product_name, f.material_name
+            """,
+            "update_product_costs": """
+                INSERT INTO product_cost_cache (product_name, material_cost)
+                SELECT p.product_name,
+                       COALESCE(SUM(f.qty_needed * pt.coef * (1 + mt.defect_percent / 100) * m.unit_price), 0)
+                FROM products p
+                JOIN product_type pt ON pt.product_type = p.product_type
+                LEFT JOIN product_bom_flat f ON f.product_name = p.product_name
+                LEFT JOIN materials m ON m.material_name = f.material_name
+                LEFT JOIN material_type mt ON mt.material_type = m.material_type
+                WHERE (%s::varchar[] IS NULL OR p.product_name = ANY(%s))
+                  AND NOT EXISTS (SELECT 1 FROM product_cost_cache c WHERE c.product_name = p.product_name)
+                GROUP BY p.product_name
+                ON CONFLICT DO NOTHING
+            """,
+            "product_costs": """
+                SELECT c.product_name, ROUND(c.material_cost, 2)
+                FROM product_cost_cache c
+                WHERE c.product_name = ANY(%s)
+            """,
+            "product_costs_page": """
+                SELECT c.product_name, p.product_type, ROUND(c.material_cost, 2), p.min_price,
+                       ROUND(p.min_price - c.material_cost, 2) AS margin
+                FROM product_cost_cache c
+                JOIN products p ON p.product_name = c.product_name
+                WHERE {keyset}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+
+            # План закупок
+            "unknown_products": """
+                SELECT o.product_name
+                FROM unnest(%s::varchar[]) AS o(product_name)
+                WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.product_name = o.product_name)
+                ORDER BY o.product_name
+            """,
+            "plan_purchases": """
+                WITH orders AS (
+                    SELECT o.product_name, o.quantity
+                    FROM unnest(%s::varchar[], %s::numeric[]) AS o(product_name, quantity)
+                ),
+                demand AS (
+                    SELECT f.material_name,
+                           SUM(o.quantity * f.qty_needed * pt.coef * (1 + mt.defect_percent / 100)) AS required_qty
+                    FROM orders o
+                    JOIN products p ON p.product_name = o.product_name
+                    JOIN product_type pt ON pt.product_type = p.product_type
+                    JOIN product_bom_flat f ON f.product_name = o.product_name
+                    JOIN materials m ON m.material_name = f.material_name
+                    JOIN material_type mt ON mt.material_type = m.material_type
+                    GROUP BY f.material_name
+                )
+                SELECT d.material_name, ROUND(d.required_qty, 4), m.stock_qty, ROUND(n.shortage_qty, 4),
+                       COALESCE(CEIL(n.shortage_qty / NULLIF(m.pack_qty, 0)) * m.pack_qty,
+                                n.shortage_qty) AS purchase_qty,
+                       m.unit
+                FROM demand d
+                JOIN materials m ON m.material_name = d.material_name
+                CROSS JOIN LATERAL (SELECT GREATEST(d.required_qty - m.stock_qty, 0) AS shortage_qty) n
+                ORDER BY d.material_name
+            """,
+
+            # Массовый импорт через временную таблицу (DatabaseManager._import_file):
+            # {table}, {key}, {columns} и проверки собираются из описания колонок файла
+            "import_create": """
+                CREATE TEMP TABLE import_rows (
+                    line_no integer,
+                    {columns},
+                    error text
+                ) ON COMMIT DROP
+            """,
+            "import_copy": "COPY import_rows ({columns}) FROM STDIN WITH (FORMAT csv)",
+            "import_check_required": "WHEN coalesce(trim({column}), '') = '' THEN 'не заполнено поле {column}'",
+            "import_check_reference": (
+                "WHEN NOT EXISTS (SELECT 1 FROM {reference} r WHERE r.{reference} = trim(s.{column}))"
+                " THEN 'неизвестное значение {column}'"
+            ),
+            "import_check_number": (
+                "WHEN coalesce({column}, '') !~ '^\\s*\\d{{1,{digits}}}([.,]\\d+)?\\s*$'"
+                " THEN 'некорректное число в поле {column}'"
+            ),
+            "import_text_value": "trim({column})",
+            "import_number_value": "replace(trim({column}), ',', '.')::numeric",
+            "import_validate": """
+                UPDATE import_rows s SET error = CASE {conditions} END
+                WHERE error IS NULL
+            """,
+            # Из повторяющихся ключей загружается последняя строка файла
+            "import_duplicates": """
+                UPDATE import_rows s SET error = 'ключ повторяется ниже в файле'
+                FROM (
+                    SELECT line_no, row_number() OVER (PARTITION BY trim({key}) ORDER BY line_no DESC) AS n
+                    FROM import_rows WHERE error IS NULL
+                ) d
+                WHERE d.line_no = s.line_no AND d.n > 1
+            """,
+            "import_upsert": """
+                INSERT INTO {table} ({columns})
+                SELECT {values} FROM import_rows s WHERE error IS NULL
+                ON CONFLICT ({key}) DO UPDATE SET
+                    {updates}
+            """,
+            "import_errors": """
+                SELECT line_no, {key}, error FROM import_rows
+                WHERE error IS NOT NULL ORDER BY line_no
+            """,
+
+            # Выгрузка таблиц (DatabaseManager.export_table): export_<таблица>
+            "export_materials": """
+                SELECT material_name, material_type, unit_price, stock_qty, min_qty, pack_qty, unit
+                FROM materials ORDER BY material_name
+            """,
+            "export_products": """
+                SELECT product_name, product_type, sku, min_price, roll_width
+                FROM products ORDER BY product_name
+            """,
+            "export_product_materials": """
+                SELECT product_name, material_name, qty_needed
+                FROM product_materials ORDER BY product_name, material_name
+            """,
+            "export_copy": "COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+        },
+    },
+    "furniture": {
+        "connection": {
+            "dbname": "furniture_db",
+            "user": "postgres",
+            "password": "123Qwe",
+            "host": "localhost",
+            "cursor_factory": InstrumentedCursor
+        },
+        "pool": {"minconn": 1, "maxconn": 10},
+        "references": {
+            "MaterialTypes": "SELECT material_type_id, type_name FROM MaterialTypes",
+            "ProductTypes": "SELECT product_type_id, type_name FROM ProductTypes",
+        },
+        "channel": None,
+        "material_types": ("MaterialTypes", 1),
+        "product_types": ("ProductTypes", 1),
+        "sort_columns": {"materials_page": ["m.material_id"], "products_page": ["p.product_id"]},
+        "filters": {},
+        "statements": {
+            "materials_page": """
+                SELECT m.material_id, m.material_name, mt.type_name, m.unit_price,
+                       m.quantity_in_stock, m.min_quantity, m.unit_of_measure
+                FROM Materials m
+                JOIN MaterialTypes mt ON m.material_type_id = mt.material_type_id
+                WHERE {keyset}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+            "material": """
+                SELECT m.material_id, m.material_name, m.material_type_id, m.unit_price,
+                       m.quantity_in_stock, m.min_quantity, m.package_quantity, m.unit_of_measure
+                FROM Materials m
+                WHERE m.material_id = %s
+            """,
+            "add_material": """
+                INSERT INTO Materials (material_name, material_type_id, unit_price, quantity_in_stock,
+                                       min_quantity, package_quantity, unit_of_measure)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            "update_material": """
+                UPDATE Materials
+                SET material_name = %s, material_type_id = %s, unit_price = %s, quantity_in_stock = %s,
+                    min_quantity = %s, package_quantity = %s, unit_of_measure = %s
+                WHERE material_id = %s
+            """,
+            "delete_material": "DELETE FROM Materials WHERE material_id = %s",
+            "products_page": """
+                SELECT p.product_id, p.product_name, pt.type_name, p.min_partner_price
+                FROM Products p
+                JOIN ProductTypes pt ON p.product_type_id = pt.product_type_id
+                WHERE {keyset}
+                ORDER BY {order_by}
+                LIMIT %s
+            """,
+            "products_by_material": """
+                SELECT p.product_name, mp.required_quantity
+                FROM MaterialProducts mp
+                JOIN Products p ON mp.product_id = p.product_id
+                WHERE mp.material_id = %s
+                ORDER BY p.product_name
+            """,
+            "partners": "SELECT partner_id, company_name, phone, email FROM Partners ORDER BY partner_id",
+        },
+    },
+}
+
+
+# Общие операции над любой из схем SCHEMAS: пул соединений, кэш справочников
+# и учёт в db_metrics подключаются здесь один раз для всех вариантов приложения.
+# Запросы выполняются в своей транзакции или, если передан cursor, в транзакции
+# вызывающего (несколько запросов подряд, чтение результата execute)
+@instrument
+class Repository:
+    def __init__(self, schema, connection_params=None):
+        self.schema_name = schema
+        self.schema = SCHEMAS[schema]
+        self.connection_params = dict(connection_params or self.schema["connection"])
+        self.pool = get_pool(**self.schema["pool"], **self.connection_params)
+        self.reference = get_reference_cache(self.pool, self.schema["references"], channel=self.schema["channel"])
+
+    def close(self):
+        self.reference.stop()
+        self.pool.close()
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    @not_instrumented
+    def statement(self, name, **fragments):
+        try:
+            text = self.schema["statements"][name]
+        except KeyError:
+            raise LookupError(f"Запрос {name} не определён для схемы {self.schema_name}")
+        return text.format(**fragments) if fragments else text
+
+    @contextmanager
+    def _cursor(self, cursor):
+        if cursor is not None:
+            yield cursor
+            return
+        with self.pool.cursor() as cursor:
+            yield cursor
+
+    # Запросы на чтение выполняются как серверные подготовленные (db_pool.execute_prepared).
+    # prepare=False и execute — без подготовки: для изменяющих команд (типы параметров
+    # подготовленного запроса выводились бы из контекста, например 100 + %s — integer),
+    # служебных команд и запросов, общий план которых был бы хуже
+    def _run(self, cursor, name, params, prepare, fragments):
+        query = self.statement(name, **fragments)
+        if prepare:
+            execute_prepared(cursor, query, params)
+        else:
+            cursor.execute(query, params)
+
+    @not_instrumented
+    def fetchall(self, name, params=(), cursor=None, prepare=True, **fragments):
+        with self._cursor(cursor) as cursor:
+            self._run(cursor, name, params, prepare, fragments)
+            return cursor.fetchall()
+
+    @not_instrumented
+    def fetchone(self, name, params=(), cursor=None, prepare=True, **fragments):
+        with self._cursor(cursor) as cursor:
+            self._run(cursor, name, params, prepare, fragments)
+            return cursor.fetchone()
+
+    @not_instrumented
+    def execute(self, name, params=(), cursor=None, **fragments):
+        with self._cursor(cursor) as cursor:
+            cursor.execute(self.statement(name, **fragments), params)
+            return cursor.rowcount
+
+    @not_instrumented
+    def page(self, name, after_key=None, limit=200, filters=None, order=None, params=(), cursor=None):
+        # Keyset-пагинация: следующая страница после after_key в порядке sort_columns.
+        # params — параметры запроса до {keyset}; order — (номер колонки, по убыванию),
+        # тогда after_key — (значение колонки, ключ)
+        keyset, order_by, keyset_params = self._page_order(name, order, after_key)
+        conditions, filter_params = self._page_filters(name, filters or {})
+        where = "".join(f" AND {condition}" for condition in conditions)
+        return self.fetchall(
+            name, (*params, *keyset_params, *filter_params, limit), cursor,
+            keyset=keyset, filters=where, order_by=order_by
+        )
+
+    def _page_order(self, name, order, after_key):
+        # Условие keyset-пагинации и ORDER BY для сортировки по колонке таблицы;
+        # при равных значениях порядок определяет ключ. Первая страница — отдельный текст
+        # запроса без условия: запросы выполняются подготовленными, и общий план
+        # для "%s IS NULL OR ..." не использовал бы индекс для следующих страниц
+        sort_columns = self.schema["sort_columns"][name]
+        column, descending = order or (0, False)
+        direction = "DESC" if descending else "ASC"
+        comparison = "<" if descending else ">"
+        key_column = sort_columns[0]
+        if column == 0:
+            order_by = f"{key_column} {direction}"
+            if after_key is None:
+                return "TRUE", order_by, ()
+            return f"{key_column} {comparison} %s", order_by, (after_key,)
+        sort_column = sort_columns[column]
+        order_by = f"{sort_column} {direction}, {key_column} {direction}"
+        if after_key is None:
+            return "TRUE", order_by, ()
+        keyset = f"({sort_column}, {key_column}) {comparison} (%s, %s)"
+        return keyset, order_by, tuple(after_key)
+
+    def _filter_column(self, name, kind):
+        try:
+            return self.schema["filters"][name][kind]
+        except KeyError:
+            raise LookupError(f"Фильтр {kind} не определён для запроса {name} схемы {self.schema_name}")
+
+    def _page_filters(self, name, filters):
+        conditions = []
+        params = []
+        search = (filters.get("search") or "").strip()
+        if search:
+            # Поиск подстроки без учёта регистра; для GIN-индекса pg_trgm
+            # спецсимволы LIKE экранируются
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            columns = self._filter_column(name, "search")
+            condition = " OR ".join(f"{column} ILIKE %s" for column in columns)
+            conditions.append(f"({condition})" if len(columns) > 1 else condition)
+            params += [pattern] * len(columns)
+        if filters.get("type"):
+            conditions.append(f"{self._filter_column(name, 'type')} = %s")
+            params.append(filters["type"])
+        if filters.get("min_price") is not None:
+            conditions.append(f"{self._filter_column(name, 'price')} >= %s")
+            params.append(filters["min_price"])
+        if filters.get("max_price") is not None:
+            conditions.append(f"{self._filter_column(name, 'price')} <= %s")
+            params.append(filters["max_price"])
+        if filters.get("below_min"):
+            conditions.append(self._filter_column(name, "below_min"))
+        return conditions, params
+
+    @not_instrumented
+    def bulk(self, name, params, keys, versions=None, progress=None, chunk_size=5000):
+        # Групповая операция: одна команда с = ANY(%s) на пачку до chunk_size ключей
+        # (и их версий), все пачки в одной транзакции; progress получает процент
+        # выполнения. Возвращает строки RETURNING всех пачек
+        keys = list(keys)
+        rows = []
+        with self.pool.cursor() as cursor:
+            for start in range(0, len(keys), chunk_size):
+                chunk = (keys[start:start + chunk_size],)
+                if versions is not None:
+                    chunk += (list(versions[start:start + chunk_size]),)
+                rows.extend(self.fetchall(name, params + chunk, cursor, prepare=False))
+                if progress:
+                    progress(min(start + chunk_size, len(keys)) * 100 // len(keys))
+        return rows
+
+    def _types(self, key):
+        reference_name, label_column = self.schema[key]
+        return [(row[0], row[label_column]) for row in self.reference.get(reference_name)]
+
+    # Материалы; страницы — для LazyTableModel (fetch_page)
+    def get_materials_page(self, after_key=None, limit=200, filters=None, order=None):
+        return self.page("materials_page", after_key, limit, filters, order)
+
+    def get_material(self, material_id):
+        return self.fetchone("material", (material_id,))
+
+    def add_material(self, name, type_id, price, quantity, min_quantity, package_quantity, unit):
+        self.execute("add_material", (name, type_id, price, quantity, min_quantity, package_quantity, unit))
+
+    def update_material(self, material_id, name, type_id, price, quantity, min_quantity, package_quantity, unit):
+        self.execute(
+            "update_material", (name, type_id, price, quantity, min_quantity, package_quantity, unit, material_id)
+        )
+
+    def delete_material(self, material_id):
+        return self.execute("delete_material", (material_id,)) > 0
+
+    def get_products_by_material(self, material_id):
+        return self.fetchall("products_by_material", (material_id,))
+
+    # Справочники: [(id типа, название)]
+    def get_material_types(self):
+        return self._types("material_types")
+
+    def get_product_types(self):
+        return self._types("product_types")
+
+    # Продукция и партнёры
+    def get_products_page(self, after_key=None, limit=200, filters=None, order=None):
+        return self.page("products_page", after_key, limit, filters, order)
+
+    def get_partners(self):
+        return self.fetchall("partners")
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+
+
+class StartupTrace:
+    # Время этапов запуска приложения: каждый mark фиксирует время, прошедшее
+    # с предыдущего. Включается переменной окружения STARTUP_TRACE=1, отчёт
+    # выводится в stderr при вызове finish (после загрузки первых данных)
+    def __init__(self):
+        self.enabled = os.environ.get("STARTUP_TRACE", "") not in ("", "0")
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.stages = []
+        self.finished = False
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def finish(self, stage):
+        if self.finished:
+            return
+        self.mark(stage)
+        self.finished = True
+        if self.enabled:
+            print(self.report(), file=sys.stderr)
+
+    def report(self):
+        lines = ["Запуск приложения:"]
+        for stage, seconds in self.stages:
+            lines.append(f"  {stage:<24} {seconds * 1000:9.1f} мс")
+        lines.append(f"  {'всего':<24} {(self.last - self.started) * 1000:9.1f} мс")
+        return "\n".join(lines)
+
+
+trace = StartupTrace()
@@ -0,0 +1,221 @@
+from bisect import bisect_left
+from functools import total_ordering
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+
+@total_ordering
+class _Descending:
+    # Обёртка с обратным сравнением, чтобы список ключей при сортировке
+    # по убыванию оставался возрастающим для bisect
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+class LazyTableModel(QAbstractTableModel):
+    # Строки подгружаются страницами по мере прокрутки: fetch_page(after_key, limit)
+    # возвращает следующие limit строк после ключа after_key (keyset-пагинация).
+    # Строки должны приходить упорядоченными по ключу в порядке сравнения строк Python
+    # (в SQL — COLLATE "C"), чтобы точечные вставки попадали на своё место.
+    # Если передан executor, страницы запрашиваются в фоновом потоке.
+    # При сортировке по другой колонке (sort) after_key — пара (значение колонки, ключ),
+    # а fetch_page дополнительно получает order=(колонка, по убыванию).
+    load_failed = pyqtSignal(object)
+
+    def __init__(self, headers, fetch_page, page_size=200, key_column=0, executor=None, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.key_column = key_column
+        self.executor = executor
+        self.sort_column = None
+        self.sort_descending = False
+        self._rows = []
+        self._keys = []
+        self._index = {}
+        self._has_more = True
+        self._loading = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(self._rows[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        descending = order == Qt.DescendingOrder
+        if column == self.key_column:
+            column = None
+        if (column, descending) == (self.sort_column, self.sort_descending):
+            return
+        self.sort_column = column
+        self.sort_descending = descending
+        self.reload()
+
+    def _page_key(self, values):
+        if self.sort_column is None:
+            return values[self.key_column]
+        return (values[self.sort_column], values[self.key_column])
+
+    def _order_key(self, values):
+        key = self._page_key(values)
+        if not self.sort_descending:
+            return key
+        if isinstance(key, tuple):
+            return tuple(_Descending(value) for value in key)
+        return _Descending(key)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more or self._loading:
+            return
+        after_key = self._page_key(self._rows[-1]) if self._rows else None
+        kwargs = {}
+        if self.sort_column is not None or self.sort_descending:
+            column = self.key_column if self.sort_column is None else self.sort_column
+            kwargs["order"] = (column, self.sort_descending)
+        if self.executor is None:
+            self._append_page(self.fetch_page(after_key, self.page_size, **kwargs))
+            return
+        self._loading = True
+        self.executor.submit(
+            self.fetch_page, after_key, self.page_size,
+            on_result=self._append_page, on_error=self._page_failed, tag=id(self), **kwargs
+        )
+
+    def _page_failed(self, error):
+        self._loading = False
+        self._has_more = False
+        self.load_failed.emit(error)
+
+    def _append_page(self, rows):
+        self._loading = False
+        if len(rows) < self.page_size:
+            self._has_more = False
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+            self._rows.extend(rows)
+            self._keys.extend(map(self._order_key, rows))
+            self._index.update((row[self.key_column], row) for row in rows)
+            self.endInsertRows()
+
+    def reload(self):
+        self.beginResetModel()
+        self._rows = []
+        self._keys = []
+        self._index = {}
+        self._has_more = True
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def row_at(self, row):
+        return self._rows[row]
+
+    def row_by_key(self, key):
+        return self._index.get(key)
+
+    def _find(self, key):
+        values = self._index.get(key)
+        if values is None:
+            return -1
+        order_key = self._order_key(values)
+        row = bisect_left(self._keys, order_key)
+        if row < len(self._keys) and self._keys[row] == order_key:
+            return row
+        return -1
+
+    def insert_row(self, values):
+        key = values[self.key_column]
+        order_key = self._order_key(values)
+        row = bisect_left(self._keys, order_key)
+        if row == len(self._keys) and self._has_more:
+            # Строка попадает в ещё не загруженную страницу и придёт вместе с ней
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, values)
+        self._keys.insert(row, order_key)
+        self._index[key] = values
+        self.endInsertRows()
+
+    def update_row(self, values, old_key=None):
+        key = values[self.key_column]
+        if old_key is None:
+            old_key = key
+        row = self._find(old_key)
+        if row < 0:
+            return
+        if old_key != key or self._keys[row] != self._order_key(values):
+            # Изменилась позиция строки в текущем порядке сортировки
+            self.remove_row(old_key)
+            self.insert_row(values)
+            return
+        self._rows[row] = values
+        self._index[key] = values
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def update_rows(self, rows):
+        # Замена уже загруженных строк с тем же ключом одним сигналом dataChanged
+        changed = []
+        moved = []
+        for values in rows:
+            key = values[self.key_column]
+            row = self._find(key)
+            if row < 0:
+                continue
+            if self._keys[row] != self._order_key(values):
+                moved.append(values)
+                continue
+            self._rows[row] = values
+            self._index[key] = values
+            changed.append(row)
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0), self.index(max(changed), self.columnCount() - 1))
+        if moved:
+            self.remove_rows([values[self.key_column] for values in moved])
+            for values in moved:
+                self.insert_row(values)
+
+    def remove_rows(self, keys):
+        # Удаление идущих подряд строк выполняется одним блоком
+        rows = sorted((row for row in map(self._find, keys) if row >= 0), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for values in self._rows[first:last + 1]:
+                del self._index[values[self.key_column]]
+            del self._rows[first:last + 1]
+            del self._keys[first:last + 1]
+            self.endRemoveRows()
+
+    def remove_row(self, key):
+        row = self._find(key)
+        if row >= 0:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            del self._keys[row]
+            del self._index[key]
+            self.endRemoveRows()
@@ -0,0 +1,41 @@
+import csv
+import io
+
+import pytest
+
+from bulk_io import FileFormatError, open_import_source
+
+# Поток для COPY из CSV-файла импорта: номер строки файла, ровно столько полей,
+# сколько в заголовке, и причина отказа для строк с другим числом полей
+
+ALIASES = {"наименование": "name", "цена": "price"}
+
+
+def read_source(tmp_path, text):
+    path = tmp_path / "import.csv"
+    path.write_bytes(text.encode("utf-8-sig"))
+    columns, stream = open_import_source(str(path), ALIASES)
+    try:
+        return columns, list(csv.reader(io.StringIO(stream.read())))
+    finally:
+        stream.close()
+
+
+def test_rows_carry_file_line_numbers(tmp_path):
+    columns, rows = read_source(tmp_path, 'Наименование;Цена\r\nА;1\r\n"Б\r\nв две строки";2\r\n\r\nВ;3\r\n')
+    assert columns == ["line_no", "name", "price", "error"]
+    assert rows == [["2", "А", "1", ""], ["3", "Б\r\nв две строки", "2", ""], ["6", "В", "3", ""]]
+
+
+def test_wrong_field_count_is_rejected_row(tmp_path):
+    _, rows = read_source(tmp_path, "наименование,цена\nА\nБ,2,лишнее\nВ,3\n")
+    assert rows == [
+        ["2", "А", "", "неверное число полей: 1 вместо 2"],
+        ["3", "Б", "2", "неверное число полей: 3 вместо 2"],
+        ["4", "В", "3", ""],
+    ]
+
+
+def test_unknown_header_column(tmp_path):
+    with pytest.raises(FileFormatError):
+        read_source(tmp_path, "наименование,цена,вес\nА,1,2\n")
@@ -0,0 +1,90 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from database import DatabaseManager
+
+# Пакетный расчёт calculate_material_quantities (numpy, float) должен совпадать
+# с calculate_material_quantity (Decimal) строка в строку. Справочники подставляются
+# вместо ReferenceCache, подключение к базе не нужно
+
+PRODUCT_COEF = {
+    "Декоративные обои": Decimal("5.50"),
+    "Обои под покраску": Decimal("3.25"),
+    "Стеклообои": Decimal("2.50"),
+    "Фотообои": Decimal("7.54"),
+}
+DEFECT_PERCENT = {
+    "Краска": Decimal("0.50"),
+    "Клей": Decimal("0.15"),
+    "Дисперсия": Decimal("0.20"),
+    "Бумага": Decimal("0.70"),
+}
+
+
+class FakeReference:
+    def lookup(self, name):
+        return {"product_type": PRODUCT_COEF, "material_type": DEFECT_PERCENT}[name]
+
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.reference = FakeReference()
+    return manager
+
+
+def money(rng, high):
+    return Decimal(rng.randrange(0, high * 100)) / 100
+
+
+def random_cases(count, seed=2024):
+    rng = random.Random(seed)
+    product_types = list(PRODUCT_COEF) + ["Нет такого типа"]
+    material_types = list(DEFECT_PERCENT) + ["Нет такого типа"]
+    cases = []
+    for _ in range(count):
+        cases.append((
+            rng.choice(product_types), rng.choice(material_types), rng.randrange(0, 1000),
+            money(rng, 50), money(rng, 50), money(rng, 5000),
+        ))
+    return cases
+
+
+# Значения, при которых результат в Decimal — ровно целое число, а в float
+# без округления получился бы на единицу меньше
+EXACT_CASES = [
+    ("Декоративные обои", "Краска", 100, Decimal("4.00"), Decimal("1.00"), Decimal("0")),
+    ("Декоративные обои", "Краска", 200, Decimal("2.00"), Decimal("1.00"), Decimal("0")),
+    ("Декоративные обои", "Краска", 300, Decimal("4.00"), Decimal("1.00"), Decimal("0")),
+    ("Обои под покраску", "Краска", 200, Decimal("4.00"), Decimal("1.00"), Decimal("0")),
+    ("Стеклообои", "Краска", 20, Decimal("4.00"), Decimal("1.00"), Decimal("0")),
+    ("Стеклообои", "Краска", 20, Decimal("4.00"), Decimal("1.00"), Decimal("1.00")),
+]
+
+
+def scalar(db, cases):
+    return [db.calculate_material_quantity(*case) for case in cases]
+
+
+def vectorized(db, cases):
+    return db.calculate_material_quantities(*zip(*cases)).tolist()
+
+
+def test_random_cases_match_scalar(db):
+    cases = random_cases(5000)
+    assert vectorized(db, cases) == scalar(db, cases)
+
+
+def test_exact_results_match_scalar(db):
+    assert vectorized(db, EXACT_CASES) == scalar(db, EXACT_CASES) == [2211, 2211, 6633, 2613, 201, 200]
+
+
+def test_unknown_types_and_surplus_stock(db):
+    cases = [
+        ("Нет такого типа", "Краска", 10, Decimal("1"), Decimal("1"), Decimal("0")),
+        ("Фотообои", "Нет такого типа", 10, Decimal("1"), Decimal("1"), Decimal("0")),
+        ("Фотообои", "Краска", 1, Decimal("1"), Decimal("1"), Decimal("1000")),
+    ]
+    assert vectorized(db, cases) == scalar(db, cases) == [-1, -1, 0]
@@ -0,0 +1,113 @@
+import re
+
+import pytest
+
+import db_metrics
+from db_metrics import BUCKETS, Metrics, instrument, not_instrumented, redact
+
+# Сокрытие параметров в журнале медленных запросов и текстовый формат Prometheus
+
+
+def test_redact_keeps_only_types():
+    assert redact(None) is None
+    assert redact(("Материал 1", 10, 2.5, None)) == ["<str>", "<int>", "<float>", None]
+    assert redact({"name": "секрет", "limit": 200}) == {"name": "<str>", "limit": "<int>"}
+
+
+def test_redact_nested_and_long_sequences():
+    assert redact([["a", 1], ("b",)]) == [["<str>", "<int>"], ["<str>"]]
+    assert redact(list(range(21))) == "<list[21]>"
+    assert redact((["x"] * 100,)) == ["<list[100]>"]
+    assert redact(list(range(20))) == ["<int>"] * 20
+
+
+@pytest.fixture
+def metrics():
+    collected = Metrics()
+    collected.enable(slow_query_ms=50)
+    return collected
+
+
+def test_slow_query_log_has_no_parameter_values(metrics):
+    metrics.record_query(b"SELECT *\n  FROM materials WHERE material_name = %s", ("секрет",), 0.2, 1, False)
+    metrics.record_query("SELECT 1", None, 0.001, 1, False)
+    [entry] = metrics.slow_queries
+    assert entry["query"] == "SELECT * FROM materials WHERE material_name = %s"
+    assert entry["params"] == ["<str>"]
+    assert "секрет" not in metrics.to_json()
+
+
+def parse_prometheus(text):
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            types[name] = kind
+            continue
+        match = re.fullmatch(r'(\w+)\{([^}]*)\} (\S+)', line)
+        assert match, line
+        labels = tuple(re.findall(r'(\w+)="([^"]*)"', match.group(2)))
+        samples[(match.group(1), labels)] = float(match.group(3))
+    return types, samples
+
+
+def test_prometheus_histograms_and_counters(metrics):
+    def fetch():
+        metrics.record_query("SELECT 1", None, 0.003, 2, False)
+        metrics.record_query("SELECT 2", None, 0.3, 5, False)
+        return [1, 2, 3]
+
+    def fail():
+        raise RuntimeError("нет соединения")
+
+    metrics.call("DatabaseManager.fetch", fetch, (), {})
+    with pytest.raises(RuntimeError):
+        metrics.call("DatabaseManager.fail", fail, (), {})
+
+    types, samples = parse_prometheus(metrics.to_prometheus())
+    assert types == {
+        "db_method_duration_seconds": "histogram", "db_method_rows_total": "counter",
+        "db_method_errors_total": "counter", "db_query_duration_seconds": "histogram",
+        "db_query_rows_total": "counter", "db_query_errors_total": "counter",
+    }
+    method = (("method", "DatabaseManager.fetch"),)
+    assert samples[("db_method_rows_total", method)] == 3
+    assert samples[("db_method_errors_total", (("method", "DatabaseManager.fail"),))] == 1
+    assert samples[("db_query_rows_total", method)] == 7
+    assert samples[("db_query_duration_seconds_count", method)] == 2
+    assert samples[("db_query_duration_seconds_sum", method)] == pytest.approx(0.303)
+
+    buckets = [samples[("db_query_duration_seconds_bucket", method + (("le", le),))]
+               for le in [repr(bound) for bound in BUCKETS] + ["+Inf"]]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 2
+    assert samples[("db_query_duration_seconds_bucket", method + (("le", "0.0025"),))] == 0
+    assert samples[("db_query_duration_seconds_bucket", method + (("le", "0.005"),))] == 1
+    assert samples[("db_query_duration_seconds_bucket", method + (("le", "0.25"),))] == 1
+    assert samples[("db_query_duration_seconds_bucket", method + (("le", "0.5"),))] == 2
+
+
+def test_empty_metrics_export_only_type_lines():
+    collected = Metrics()
+    assert collected.to_prometheus().count("\n") == 6
+    assert collected.snapshot() == {"methods": {}, "queries": {}, "slow_queries": []}
+
+
+def test_queries_of_helper_methods_count_for_caller(monkeypatch, metrics):
+    monkeypatch.setattr(db_metrics, "metrics", metrics)
+
+    @instrument
+    class Repository:
+        @not_instrumented
+        def fetchall(self, name):
+            metrics.record_query(name, None, 0.001, 3, False)
+            return [1, 2, 3]
+
+        def get_materials(self):
+            return self.fetchall("materials")
+
+    Repository().get_materials()
+    snapshot = metrics.snapshot()
+    assert list(snapshot["methods"]) == ["Repository.get_materials"]
+    assert snapshot["queries"]["Repository.get_materials"]["rows"] == 3
@@ -0,0 +1,198 @@
+import threading
+import time
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout, _numbered_placeholders
+
+# Перевод параметров psycopg2 (%s) в нумерованные параметры PREPARE ($1, $2, ...)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT 1", "SELECT 1"),
+    ("SELECT * FROM materials WHERE material_id = %s", "SELECT * FROM materials WHERE material_id = $1"),
+    ("SELECT %s, %s, %s", "SELECT $1, $2, $3"),
+    ("WHERE name > %s ORDER BY name LIMIT %s", "WHERE name > $1 ORDER BY name LIMIT $2"),
+])
+def test_placeholders_are_numbered_in_order(query, expected):
+    assert _numbered_placeholders(query) == expected
+
+
+def test_escaped_percent_is_not_a_placeholder():
+    assert _numbered_placeholders("WHERE name ILIKE '%%' || %s || '%%'") == "WHERE name ILIKE '%' || $1 || '%'"
+    assert _numbered_placeholders("SELECT 100 %% %s") == "SELECT 100 % $1"
+
+
+def test_escaped_percent_before_s_is_literal():
+    # %%s — это символ % и буква s, а не параметр
+    assert _numbered_placeholders("SELECT '%%s', %s") == "SELECT '%s', $1"
+
+
+# Пул соединений без базы данных: _new_connection возвращает FakeConnection
+
+IDLE = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+IN_TRANSACTION = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+IN_ERROR = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        if not self.connection.healthy:
+            self.connection.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.connection.status = IN_TRANSACTION
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = IDLE
+        self.healthy = True
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.status = IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class StubPool(ConnectionPool):
+    def _new_connection(self):
+        return FakeConnection()
+
+
+def test_checkout_timeout():
+    pool = StubPool({}, minconn=1, maxconn=1, checkout_timeout=0.05)
+    connection = pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    pool.putconn(connection)
+    assert pool.getconn() is connection
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waits"] == 1
+
+
+def test_maxconn_is_not_exceeded_under_threads():
+    pool = StubPool({}, minconn=1, maxconn=3, checkout_timeout=5.0)
+    lock = threading.Lock()
+    in_use = set()
+    peak = []
+
+    def worker():
+        for _ in range(20):
+            connection = pool.getconn()
+            with lock:
+                assert connection not in in_use
+                in_use.add(connection)
+                peak.append(len(in_use))
+            time.sleep(0.001)
+            with lock:
+                in_use.remove(connection)
+            pool.putconn(connection)
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = pool.stats()
+    assert max(peak) == 3
+    assert stats["created"] == 3
+    assert stats["checkouts"] == 200
+    assert stats["in_use"] == 0 and stats["idle"] == 3
+
+
+def test_idle_connections_above_minconn_are_reaped():
+    pool = StubPool({}, minconn=1, maxconn=5, max_idle=0.05)
+    connections = [pool.getconn() for _ in range(3)]
+    for connection in connections:
+        pool.putconn(connection)
+    pool.reap()
+    assert pool.stats()["idle"] == 3
+    time.sleep(0.06)
+    pool.reap()
+    stats = pool.stats()
+    assert stats["idle"] == 1
+    assert stats["reaped"] == 2
+    assert sum(connection.closed != 0 for connection in connections) == 2
+
+
+def test_failed_health_check_discards_connection():
+    pool = StubPool({}, minconn=1, maxconn=1, health_check_after=0.0)
+    broken = pool.getconn()
+    pool.putconn(broken)
+    broken.healthy = False
+    connection = pool.getconn()
+    assert connection is not broken
+    assert broken.closed
+    stats = pool.stats()
+    assert stats["health_check_failures"] == 1
+    assert stats["created"] == 2 and stats["closed"] == 1
+
+
+def test_putconn_rolls_back_open_transaction():
+    pool = StubPool({}, minconn=1, maxconn=1)
+    connection = pool.getconn()
+    connection.status = IN_TRANSACTION
+    pool.putconn(connection)
+    assert connection.rollbacks == 1
+    assert not connection.closed
+    assert pool.getconn() is connection
+
+
+@pytest.mark.parametrize("error", [
+    psycopg2.errors.QueryCanceled("canceling statement due to statement timeout"),
+    psycopg2.errors.DeadlockDetected("deadlock detected"),
+    psycopg2.errors.SerializationFailure("could not serialize access"),
+])
+def test_query_errors_keep_connection(error):
+    pool = StubPool({}, minconn=1, maxconn=1)
+    with pytest.raises(type(error)):
+        with pool.connection() as connection:
+            connection.prepared = {"SELECT 1": "prepared_1"}
+            connection.status = IN_ERROR
+            raise error
+    assert connection.rollbacks == 1
+    assert not connection.closed
+    with pool.connection() as again:
+        assert again is connection
+        assert again.prepared == {"SELECT 1": "prepared_1"}
+    assert pool.stats()["closed"] == 0
+
+
+def test_broken_connection_is_discarded():
+    pool = StubPool({}, minconn=1, maxconn=1)
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.cursor() as cursor:
+            cursor.connection.healthy = False
+            cursor.execute("SELECT 1")
+    assert cursor.connection.closed
+    stats = pool.stats()
+    assert stats["closed"] == 1 and stats["idle"] == 0
+    assert pool.getconn() is not cursor.connection
@@ -0,0 +1,154 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PyQt5.QtCore import QCoreApplication, Qt
+
+from table_models import LazyTableModel, _Descending
+
+# Проверка порядка строк LazyTableModel без базы данных: fetch_page имитирует
+# keyset-пагинацию DatabaseManager по списку в памяти
+
+HEADERS = ["Наименование", "Цена"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def application():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def make_model(rows, page_size=3):
+    table = list(rows)
+
+    def fetch_page(after_key, limit, order=None):
+        column, descending = order or (0, False)
+        if column == 0:
+            def sort_key(row):
+                return row[0]
+        else:
+            def sort_key(row):
+                return (row[column], row[0])
+        ordered = sorted(table, key=sort_key, reverse=descending)
+        if after_key is not None:
+            if descending:
+                ordered = [row for row in ordered if sort_key(row) < after_key]
+            else:
+                ordered = [row for row in ordered if sort_key(row) > after_key]
+        return ordered[:limit]
+
+    model = LazyTableModel(HEADERS, fetch_page, page_size=page_size)
+    model.fetchMore()
+    return model, table
+
+
+def load_all(model):
+    while model.canFetchMore():
+        model.fetchMore()
+
+
+def names(model):
+    return [model.row_at(row)[0] for row in range(model.rowCount())]
+
+
+def check_order(model):
+    keys = [model._order_key(model.row_at(row)) for row in range(model.rowCount())]
+    assert model._keys == keys
+    assert keys == sorted(keys)
+    assert set(model._index) == set(names(model))
+
+
+ROWS = [("Б", 5), ("Г", 1), ("А", 3), ("Д", 3), ("В", 9), ("Е", 7), ("Ж", 2)]
+
+
+def test_descending_wrapper_reverses_comparison():
+    assert _Descending(2) < _Descending(1)
+    assert _Descending(1) == _Descending(1)
+    assert sorted([_Descending(value) for value in [1, 3, 2]])[0].value == 3
+    assert (_Descending(3), _Descending("Б")) < (_Descending(3), _Descending("А"))
+
+
+def test_pages_load_in_key_order():
+    model, _ = make_model(ROWS)
+    assert model.rowCount() == 3
+    load_all(model)
+    assert names(model) == sorted(name for name, _ in ROWS)
+    assert not model.canFetchMore()
+    check_order(model)
+
+
+@pytest.mark.parametrize("order", [Qt.AscendingOrder, Qt.DescendingOrder])
+def test_sort_by_column_keeps_keyset_order(order):
+    model, _ = make_model(ROWS)
+    model.sort(1, order)
+    load_all(model)
+    expected = sorted(ROWS, key=lambda row: (row[1], row[0]), reverse=order == Qt.DescendingOrder)
+    assert names(model) == [name for name, _ in expected]
+    check_order(model)
+
+
+def test_sort_descending_by_key_column():
+    model, _ = make_model(ROWS)
+    model.sort(0, Qt.DescendingOrder)
+    load_all(model)
+    assert names(model) == sorted((name for name, _ in ROWS), reverse=True)
+    check_order(model)
+
+
+@pytest.mark.parametrize("order", [Qt.AscendingOrder, Qt.DescendingOrder])
+def test_insert_row_goes_to_sorted_position(order):
+    model, _ = make_model(ROWS)
+    model.sort(1, order)
+    load_all(model)
+    model.insert_row(("Ё", 4))
+    model.insert_row(("З", 3))
+    check_order(model)
+    assert model.rowCount() == len(ROWS) + 2
+
+
+def test_insert_row_after_loaded_pages_waits_for_page():
+    model, table = make_model(ROWS)
+    table.append(("Я", 1))
+    model.insert_row(("Я", 1))
+    assert model.row_by_key("Я") is None
+    load_all(model)
+    assert names(model)[-1] == "Я"
+    check_order(model)
+
+
+@pytest.mark.parametrize("order", [Qt.AscendingOrder, Qt.DescendingOrder])
+def test_update_rows_moves_rows_when_sort_value_changes(order):
+    model, _ = make_model(ROWS)
+    model.sort(1, order)
+    load_all(model)
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append((first.row(), last.row())))
+    model.update_rows([("А", 100), ("Б", 5), ("Ж", -1)])
+    check_order(model)
+    assert model.row_by_key("А") == ("А", 100)
+    assert model.row_by_key("Ж") == ("Ж", -1)
+    assert len(changed) == 1
+    assert model.rowCount() == len(ROWS)
+
+
+def test_update_row_rename_moves_row():
+    model, _ = make_model(ROWS)
+    load_all(model)
+    model.update_row(("Я", 5), old_key="Б")
+    assert model.row_by_key("Б") is None
+    assert names(model)[-1] == "Я"
+    check_order(model)
+
+
+@pytest.mark.parametrize("order", [Qt.AscendingOrder, Qt.DescendingOrder])
+def test_remove_rows_contiguous_and_scattered(order):
+    model, _ = make_model(ROWS)
+    model.sort(1, order)
+    load_all(model)
+    removed = []
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+    keys = names(model)
+    model.remove_rows([keys[1], keys[2], keys[5], "нет такого"])
+    assert len(removed) == 2
+    assert names(model) == [key for index, key in enumerate(keys) if index not in (1, 2, 5)]
+    check_order(model)